@@ -0,0 +1,77 @@
+import copy
+import threading
+import multiprocessing
+from engine import SearchEngine
+
+# Движок в отдельном процессе, чтобы поиск не делил GIL с циклом отрисовки.
+# Запросы нумеруются; отмена поднимает общий порог cancelled, и поиск любого
+# запроса с номером не выше порога прерывается при ближайшей проверке
+# бюджета, а ещё не начатые запросы пропускаются. Результаты читает фоновый
+# поток и передаёт в on_result(request_id, move, stats).
+
+
+def _engine_loop(commands, results, cancelled, tt_size_mb):
+    engine = SearchEngine(tt_size_mb)
+    while True:
+        command = commands.get()
+        if command[0] == 'quit':
+            break
+        kind, request_id, board, time_limit = command
+        if request_id <= cancelled.value:
+            continue
+        # Размышление на время соперника: поиск без лимита до отмены. Найденный
+        # ход не нужен, важна заполненная таблица транспозиций для следующего поиска.
+        move = engine.search(board, time_limit=time_limit,
+                             should_stop=lambda: request_id <= cancelled.value)
+        if kind == 'think':
+            results.put((request_id, move, engine.stats()))
+
+
+class AsyncEngine:
+    def __init__(self, on_result, tt_size_mb=64):
+        context = multiprocessing.get_context('spawn')
+        self.on_result = on_result
+        self.commands = context.Queue()
+        self.results = context.Queue()
+        self.cancelled = context.Value('l', 0, lock=False)
+        self.request_id = 0
+        self.process = context.Process(target=_engine_loop, args=(self.commands, self.results, self.cancelled,
+                                                                  tt_size_mb), daemon=True)
+        self.process.start()
+        self.listener = threading.Thread(target=self._listen, daemon=True)
+        self.listener.start()
+
+    def _listen(self):
+        while True:
+            result = self.results.get()
+            if result is None:
+                break
+            request_id, move, stats = result
+            # Ответы на отменённые запросы отбрасываются
+            if request_id > self.cancelled.value:
+                self.on_result(request_id, move, stats)
+
+    def _submit(self, kind, board, time_limit):
+        self.cancel()
+        self.request_id += 1
+        # Копия снимается сразу: очередь сериализует объект позже, в своём потоке
+        self.commands.put((kind, self.request_id, copy.deepcopy(board), time_limit))
+        return self.request_id
+
+    # Запрос лучшего хода; предыдущий запрос или размышление отменяются
+    def think(self, board, time_limit=1.0):
+        return self._submit('think', board, time_limit)
+
+    def ponder(self, board):
+        return self._submit('ponder', board, None)
+
+    def cancel(self):
+        self.cancelled.value = self.request_id
+
+    def close(self):
+        self.cancel()
+        self.commands.put(('quit',))
+        self.results.put(None)
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,55 @@
+import os
+import importlib
+
+# Ленивая загрузка тяжёлых зависимостей. Правила (logic.py) и интерфейс
+# (interface.py) их не импортируют вовсе, а нейросетевые модули получают
+# tensorflow через LazyModule: настоящий импорт происходит при первом
+# обращении к атрибуту, а не при импорте модуля.
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+
+tf = LazyModule('tensorflow')
+
+
+# Подсказки нейросети для интерфейсов: модель загружается при первом запросе.
+# Если файла модели нет, recommend возвращает None и ничего не импортирует.
+class PolicyBackend:
+    def __init__(self, model_path='best_models/best_model.keras'):
+        self.model_path = model_path
+        self._inference = None
+
+    @property
+    def available(self):
+        return os.path.exists(self.model_path)
+
+    @property
+    def inference(self):
+        if self._inference is None and self.available:
+            from inference import InferenceModel
+            self._inference = InferenceModel(self.model_path)
+        return self._inference
+
+    def recommend(self, board):
+        if self.inference is None:
+            return None
+        return self.inference.best_move(board)
+
+    def stats(self):
+        return self._inference.stats() if self._inference is not None else {}
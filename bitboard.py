@@ -0,0 +1,272 @@
+from logic import Board, Pawn, Knight, Bishop, Rook, Queen, King
+
+# Клетка доски кодируется числом sq = row * 8 + col, как и в logic.Board:
+# строка 0 — последняя горизонталь чёрных, строка 7 — белых.
+FULL = (1 << 64) - 1
+PIECE_TYPES = [Pawn, Knight, Bishop, Rook, Queen, King]
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+COLORS = ['white', 'black']
+WHITE, BLACK = 0, 1
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def bit(sq):
+    return 1 << sq
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# Предварительно вычисленные таблицы атак
+def _leaper_attacks(offsets):
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask = 0
+        for dr, dc in offsets:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                mask |= bit(square(r, c))
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_attacks([(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)])
+KING_ATTACKS = _leaper_attacks([(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)])
+# Белые пешки бьют в сторону уменьшения строки, чёрные — увеличения
+PAWN_ATTACKS = [_leaper_attacks([(-1, -1), (-1, 1)]), _leaper_attacks([(1, -1), (1, 1)])]
+
+# Лучи для дальнобойных фигур. Для направлений с положительным шагом ближайший
+# блокирующий бит — младший, для отрицательного — старший.
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def _ray(sq, dr, dc):
+    row, col = divmod(sq, 8)
+    mask = 0
+    r, c = row + dr, col + dc
+    while 0 <= r < 8 and 0 <= c < 8:
+        mask |= bit(square(r, c))
+        r += dr
+        c += dc
+    return mask
+
+
+RAYS = {d: [_ray(sq, *d) for sq in range(64)] for d in ROOK_DIRECTIONS + BISHOP_DIRECTIONS}
+
+
+def _slider_attacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            if d[0] * 8 + d[1] > 0:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[d][blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, ROOK_DIRECTIONS)
+
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, BISHOP_DIRECTIONS)
+
+
+def queen_attacks(sq, occupied):
+    return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+
+
+class BitBoard:
+    # Компактное представление позиции: двенадцать 64-битных масок
+    # (индекс = цвет * 6 + тип фигуры) и сторона, которая ходит.
+    # Формат ходов тот же, что у logic.Board; генератор псевдодопустимый
+    # и без особых ходов (рокировки, взятия на проходе, превращения).
+    def __init__(self, board=None):
+        self.pieces = [0] * 12
+        self.current_turn = 'white'
+        if board is None:
+            board = Board()
+        self._load(board)
+
+    @classmethod
+    def from_board(cls, board):
+        return cls(board)
+
+    def _load(self, board):
+        self.pieces = [0] * 12
+        for row in range(8):
+            for col in range(8):
+                piece = board.board[row][col]
+                if piece is not None:
+                    idx = COLORS.index(piece.color) * 6 + PIECE_TYPES.index(type(piece))
+                    self.pieces[idx] |= bit(square(row, col))
+        self.current_turn = board.current_turn
+
+    def to_board(self):
+        board = Board()
+        board.board = self.board
+        board.current_turn = self.current_turn
+        board.castling = board.home_castling_rights()
+        board.zobrist_key = board.compute_zobrist()
+        return board
+
+    # Сетка 8x8 из объектов Piece — для кода, который обращается к board.board
+    @property
+    def board(self):
+        grid = [[None for _ in range(8)] for _ in range(8)]
+        for idx, mask in enumerate(self.pieces):
+            color, piece_type = divmod(idx, 6)
+            for sq in iter_bits(mask):
+                grid[sq // 8][sq % 8] = PIECE_TYPES[piece_type](COLORS[color])
+        return grid
+
+    def copy(self):
+        other = BitBoard.__new__(BitBoard)
+        other.pieces = list(self.pieces)
+        other.current_turn = self.current_turn
+        return other
+
+    def occupancy(self, color):
+        base = COLORS.index(color) * 6
+        occ = 0
+        for mask in self.pieces[base:base + 6]:
+            occ |= mask
+        return occ
+
+    def piece_at(self, sq):
+        b = bit(sq)
+        for idx, mask in enumerate(self.pieces):
+            if mask & b:
+                return idx
+        return None
+
+    # Множество клеток, которые фигура на sq атакует или на которые может пойти
+    def _targets(self, idx, sq, own, enemy):
+        color, piece_type = divmod(idx, 6)
+        occupied = own | enemy
+        if piece_type == PAWN:
+            targets = PAWN_ATTACKS[color][sq] & enemy
+            row = sq // 8
+            if color == WHITE:
+                single = (bit(sq) >> 8) & ~occupied
+                targets |= single
+                if single and row == 6:
+                    targets |= (single >> 8) & ~occupied
+            else:
+                single = (bit(sq) << 8) & ~occupied & FULL
+                targets |= single
+                if single and row == 1:
+                    targets |= (single << 8) & ~occupied & FULL
+            return targets
+        if piece_type == KNIGHT:
+            attacks = KNIGHT_ATTACKS[sq]
+        elif piece_type == BISHOP:
+            attacks = bishop_attacks(sq, occupied)
+        elif piece_type == ROOK:
+            attacks = rook_attacks(sq, occupied)
+        elif piece_type == QUEEN:
+            attacks = queen_attacks(sq, occupied)
+        else:
+            attacks = KING_ATTACKS[sq]
+        return attacks & ~own
+
+    def _moves_for(self, color):
+        c = COLORS.index(color)
+        own = self.occupancy(color)
+        enemy = self.occupancy(COLORS[1 - c])
+        moves = []
+        for idx in range(c * 6, c * 6 + 6):
+            for sq in iter_bits(self.pieces[idx]):
+                for to in iter_bits(self._targets(idx, sq, own, enemy)):
+                    moves.append(((sq // 8, sq % 8), (to // 8, to % 8)))
+        return moves
+
+    def get_possible_moves(self, x, y):
+        idx = self.piece_at(square(x, y))
+        if idx is None:
+            return []
+        color = COLORS[idx // 6]
+        own = self.occupancy(color)
+        enemy = self.occupancy(COLORS[1 - idx // 6])
+        return [(to // 8, to % 8) for to in iter_bits(self._targets(idx, square(x, y), own, enemy))]
+
+    def get_all_possible_moves(self):
+        return self._moves_for(self.current_turn)
+
+    def _make(self, start_pos, end_pos):
+        frm = square(*start_pos)
+        to = square(*end_pos)
+        idx = self.piece_at(frm)
+        to_bit = bit(to)
+        for i in range(12):
+            if self.pieces[i] & to_bit:
+                self.pieces[i] ^= to_bit
+        self.pieces[idx] ^= bit(frm) | to_bit
+        self.current_turn = 'black' if self.current_turn == 'white' else 'white'
+
+    def move_piece(self, start_pos, end_pos):
+        idx = self.piece_at(square(*start_pos))
+        if idx is not None and end_pos in self.get_possible_moves(*start_pos):
+            self._make(start_pos, end_pos)
+        else:
+            raise ValueError("Invalid move")
+
+    def find_king(self, color):
+        mask = self.pieces[COLORS.index(color) * 6 + KING]
+        if not mask:
+            return None
+        sq = mask.bit_length() - 1
+        return (sq // 8, sq % 8)
+
+    # Атакована ли клетка sq фигурами цвета by_color
+    def is_square_attacked(self, sq, by_color):
+        c = COLORS.index(by_color)
+        base = c * 6
+        occupied = self.occupancy('white') | self.occupancy('black')
+        if PAWN_ATTACKS[1 - c][sq] & self.pieces[base + PAWN]:
+            return True
+        if KNIGHT_ATTACKS[sq] & self.pieces[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & self.pieces[base + KING]:
+            return True
+        queens = self.pieces[base + QUEEN]
+        if bishop_attacks(sq, occupied) & (self.pieces[base + BISHOP] | queens):
+            return True
+        if rook_attacks(sq, occupied) & (self.pieces[base + ROOK] | queens):
+            return True
+        return False
+
+    def is_in_check(self, color):
+        king_pos = self.find_king(color)
+        if king_pos is None:
+            return False
+        enemy = 'black' if color == 'white' else 'white'
+        return self.is_square_attacked(square(*king_pos), enemy)
+
+    def _has_escape(self, color):
+        for start, end in self._moves_for(color):
+            child = self.copy()
+            child._make(start, end)
+            if not child.is_in_check(color):
+                return True
+        return False
+
+    def is_checkmate(self, color):
+        return self.is_in_check(color) and not self._has_escape(color)
+
+    def is_stalemate(self, color):
+        return not self.is_in_check(color) and not self._has_escape(color)
@@ -0,0 +1,84 @@
+import numpy as np
+from logic import Pawn, Knight, Bishop, Rook, Queen, King, castling_rook_squares
+
+# Кодирование позиции в тензор (8, 8, 12): плоскости 0-5 — белые пешка, конь,
+# слон, ладья, ферзь, король, плоскости 6-11 — то же для чёрных.
+PLANES = 12
+STATE_SHAPE = (8, 8, PLANES)
+PLANE_INDEX = {
+    (piece_type, color): idx + (6 if color == 'black' else 0)
+    for idx, piece_type in enumerate([Pawn, Knight, Bishop, Rook, Queen, King])
+    for color in ('white', 'black')
+}
+
+
+def plane_of(piece):
+    return PLANE_INDEX[(type(piece), piece.color)]
+
+
+# Кодирование одной доски. Если передан out (например, срез пачки), запись
+# идёт в него без выделения новой памяти.
+def encode_board(board, out=None, dtype=np.float32):
+    if out is None:
+        out = np.zeros(STATE_SHAPE, dtype=dtype)
+    else:
+        out.fill(0)
+    grid = board.board
+    for x in range(8):
+        row = grid[x]
+        for y in range(8):
+            piece = row[y]
+            if piece is not None:
+                out[x, y, PLANE_INDEX[(type(piece), piece.color)]] = 1
+    return out
+
+
+# Кодирование списка досок в пачку (N, 8, 8, 12) одной векторной записью
+def encode_boards(boards, out=None, dtype=np.float32):
+    if out is None:
+        out = np.zeros((len(boards),) + STATE_SHAPE, dtype=dtype)
+    else:
+        out[:len(boards)].fill(0)
+    batch_idx, rows, cols, planes = [], [], [], []
+    for b, board in enumerate(boards):
+        for x, row in enumerate(board.board):
+            for y, piece in enumerate(row):
+                if piece is not None:
+                    batch_idx.append(b)
+                    rows.append(x)
+                    cols.append(y)
+                    planes.append(PLANE_INDEX[(type(piece), piece.color)])
+    out[batch_idx, rows, cols, planes] = 1
+    return out
+
+
+# Инкрементальное обновление плоскостей после board.push(): вместо обхода
+# 64 клеток меняются только клетки последнего хода из стека отмены
+def encode_push(planes, board):
+    (x1, y1), (x2, y2), piece, captured, _, _, capture_pos = board.move_stack[-1][:7]
+    planes[x1, y1, plane_of(piece)] = 0
+    if captured is not None:
+        planes[capture_pos[0], capture_pos[1], plane_of(captured)] = 0
+    # На конечной клетке уже стоит фигура после хода — с учётом превращения
+    planes[x2, y2, plane_of(board.board[x2][y2])] = 1
+    if type(piece) is King and abs(y2 - y1) == 2:
+        (rx1, ry1), (rx2, ry2) = castling_rook_squares(x1, y1, y2)
+        plane = plane_of(board.board[rx2][ry2])
+        planes[rx1, ry1, plane] = 0
+        planes[rx2, ry2, plane] = 1
+    return planes
+
+
+# Обратное обновление; вызывается до board.pop()
+def encode_pop(planes, board):
+    (x1, y1), (x2, y2), piece, captured, _, _, capture_pos = board.move_stack[-1][:7]
+    planes[x2, y2, plane_of(board.board[x2][y2])] = 0
+    if captured is not None:
+        planes[capture_pos[0], capture_pos[1], plane_of(captured)] = 1
+    planes[x1, y1, plane_of(piece)] = 1
+    if type(piece) is King and abs(y2 - y1) == 2:
+        (rx1, ry1), (rx2, ry2) = castling_rook_squares(x1, y1, y2)
+        plane = plane_of(board.board[rx2][ry2])
+        planes[rx2, ry2, plane] = 0
+        planes[rx1, ry1, plane] = 1
+    return planes
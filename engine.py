@@ -0,0 +1,295 @@
+import time
+import metrics
+from logic import Pawn, Knight, Bishop, Rook, Queen, King
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+MATE_SCORE = 100000
+INFINITY = 10 ** 9
+MAX_PLY = 128
+
+PIECE_VALUES = {Pawn: 100, Knight: 320, Bishop: 330, Rook: 500, Queen: 900, King: 20000}
+
+# Позиционные таблицы с точки зрения белых: строка 0 — восьмая горизонталь,
+# как и в logic.Board. Для чёрных строка отражается.
+PIECE_SQUARE_TABLES = {
+    Pawn: [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [50, 50, 50, 50, 50, 50, 50, 50],
+        [10, 10, 20, 30, 30, 20, 10, 10],
+        [5, 5, 10, 25, 25, 10, 5, 5],
+        [0, 0, 0, 20, 20, 0, 0, 0],
+        [5, -5, -10, 0, 0, -10, -5, 5],
+        [5, 10, 10, -20, -20, 10, 10, 5],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    Knight: [
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+        [-40, -20, 0, 0, 0, 0, -20, -40],
+        [-30, 0, 10, 15, 15, 10, 0, -30],
+        [-30, 5, 15, 20, 20, 15, 5, -30],
+        [-30, 0, 15, 20, 20, 15, 0, -30],
+        [-30, 5, 10, 15, 15, 10, 5, -30],
+        [-40, -20, 0, 5, 5, 0, -20, -40],
+        [-50, -40, -30, -30, -30, -30, -40, -50],
+    ],
+    Bishop: [
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 10, 10, 5, 0, -10],
+        [-10, 5, 5, 10, 10, 5, 5, -10],
+        [-10, 0, 10, 10, 10, 10, 0, -10],
+        [-10, 10, 10, 10, 10, 10, 10, -10],
+        [-10, 5, 0, 0, 0, 0, 5, -10],
+        [-20, -10, -10, -10, -10, -10, -10, -20],
+    ],
+    Rook: [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [5, 10, 10, 10, 10, 10, 10, 5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [-5, 0, 0, 0, 0, 0, 0, -5],
+        [0, 0, 0, 5, 5, 0, 0, 0],
+    ],
+    Queen: [
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+        [-10, 0, 0, 0, 0, 0, 0, -10],
+        [-10, 0, 5, 5, 5, 5, 0, -10],
+        [-5, 0, 5, 5, 5, 5, 0, -5],
+        [0, 0, 5, 5, 5, 5, 0, -5],
+        [-10, 5, 5, 5, 5, 5, 0, -10],
+        [-10, 0, 5, 0, 0, 0, 0, -10],
+        [-20, -10, -10, -5, -5, -10, -10, -20],
+    ],
+    King: [
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-30, -40, -40, -50, -50, -40, -40, -30],
+        [-20, -30, -30, -40, -40, -30, -30, -20],
+        [-10, -20, -20, -20, -20, -20, -20, -10],
+        [20, 20, 0, 0, 0, 0, 20, 20],
+        [20, 30, 10, 0, 0, 10, 30, 20],
+    ],
+}
+
+
+# Статическая оценка с точки зрения стороны, которая ходит
+def evaluate(board):
+    score = 0
+    for row in range(8):
+        for col in range(8):
+            piece = board.board[row][col]
+            if piece is None:
+                continue
+            piece_type = type(piece)
+            if piece.color == 'white':
+                score += PIECE_VALUES[piece_type] + PIECE_SQUARE_TABLES[piece_type][row][col]
+            else:
+                score -= PIECE_VALUES[piece_type] + PIECE_SQUARE_TABLES[piece_type][7 - row][col]
+    return score if board.current_turn == 'white' else -score
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchEngine:
+    # Альфа-бета с итеративным углублением, таблицей транспозиций,
+    # упорядочиванием ходов (MVV-LVA, killer-ходы, история) и поиском
+    # взятий в листьях. Поиск прерывается по времени или числу узлов и
+    # возвращает лучший ход последней завершённой итерации.
+    def __init__(self, tt_size_mb=16):
+        self.tt = TranspositionTable(tt_size_mb)
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {}
+        self.nodes = 0
+        self.depth_reached = 0
+        self.best_score = 0
+        self.elapsed = 0.0
+        self.deadline = None
+        self.node_limit = None
+        self.should_stop = None
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def stats(self):
+        return {
+            'nodes': self.nodes,
+            'nps': self.nps,
+            'depth': self.depth_reached,
+            'score': self.best_score,
+            'time': self.elapsed,
+            'tt_hit_rate': self.tt.hit_rate(),
+        }
+
+    # should_stop — необязательная функция без аргументов; если она вернула
+    # True, поиск прерывается так же, как по исчерпанию бюджета
+    def search(self, board, max_depth=64, time_limit=None, node_limit=None, should_stop=None):
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        self.should_stop = should_stop
+        self.nodes = 0
+        self.depth_reached = 0
+        self.best_score = 0
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = {}
+        self.tt.new_search()
+
+        root_moves = list(board.legal_moves())
+        if not root_moves:
+            self.elapsed = time.perf_counter() - start
+            return None
+        best_move = root_moves[0]
+
+        # Ходы, сделанные поиском до прерывания, откатываются до исходной позиции
+        root_depth = len(board.move_stack)
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._root(board, root_moves, depth, best_move)
+            except SearchTimeout:
+                while len(board.move_stack) > root_depth:
+                    board.pop()
+                break
+            best_move = move
+            self.best_score = score
+            self.depth_reached = depth
+            if abs(score) >= MATE_SCORE - MAX_PLY:
+                break
+        self.elapsed = time.perf_counter() - start
+        metrics.count('search_nodes', self.nodes)
+        return best_move
+
+    def _check_budget(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if (self.nodes & 1023) == 0:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+            if self.should_stop is not None and self.should_stop():
+                raise SearchTimeout()
+
+    def _root(self, board, moves, depth, pv_move):
+        alpha, beta = -INFINITY, INFINITY
+        best_move = None
+        for move in self._order_moves(board, moves, pv_move, 0):
+            board.push(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+            board.pop()
+            if best_move is None or score > alpha:
+                alpha = score
+                best_move = move
+        self.tt.store(board.zobrist_key, depth, alpha, EXACT, best_move)
+        return alpha, best_move
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        self._check_budget()
+        # Внутри поиска ничьей считается уже первое повторение позиции
+        if board.halfmove_clock >= 100 or board.is_repetition(2):
+            return 0
+        if depth <= 0:
+            return self._quiescence(board, alpha, beta, ply)
+
+        key = board.zobrist_key
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth:
+                value, flag = entry[2], entry[3]
+                if flag == EXACT:
+                    return value
+                if flag == LOWER_BOUND and value >= beta:
+                    return value
+                if flag == UPPER_BOUND and value <= alpha:
+                    return value
+
+        moves = list(board.legal_moves())
+        if not moves:
+            return -MATE_SCORE + ply if board.is_check() else 0
+
+        best_score = -INFINITY
+        best_move = None
+        for move in self._order_moves(board, moves, tt_move, ply):
+            board.push(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if board.board[move[1][0]][move[1][1]] is None:
+                    self._remember_quiet(move, depth, ply)
+                break
+
+        if best_score <= alpha_orig:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, best_score, flag, best_move)
+        return best_score
+
+    # Поиск только взятий, чтобы оценка не обрывалась посреди размена
+    def _quiescence(self, board, alpha, beta, ply):
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        if ply >= MAX_PLY - 1:
+            return stand_pat
+
+        captures = [m for m in board.legal_moves() if board.board[m[1][0]][m[1][1]] is not None]
+        captures.sort(key=lambda m: self._mvv_lva(board, m), reverse=True)
+        for move in captures:
+            self.nodes += 1
+            self._check_budget()
+            board.push(move)
+            score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    @staticmethod
+    def _mvv_lva(board, move):
+        victim = board.board[move[1][0]][move[1][1]]
+        attacker = board.board[move[0][0]][move[0][1]]
+        return PIECE_VALUES[type(victim)] * 10 - PIECE_VALUES[type(attacker)] // 100
+
+    def _remember_quiet(self, move, depth, ply):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+    # Порядок: ход из таблицы транспозиций, взятия по MVV-LVA, killer-ходы,
+    # остальные тихие ходы по эвристике истории
+    def _order_moves(self, board, moves, tt_move, ply):
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+
+        def priority(move):
+            if move == tt_move:
+                return 10 ** 8
+            if board.board[move[1][0]][move[1][1]] is not None:
+                return 10 ** 7 + self._mvv_lva(board, move)
+            if move == killers[0]:
+                return 10 ** 6
+            if move == killers[1]:
+                return 10 ** 6 - 1
+            return self.history.get(move, 0)
+
+        return sorted(moves, key=priority, reverse=True)
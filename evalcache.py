@@ -0,0 +1,79 @@
+import itertools
+import threading
+import weakref
+from collections import OrderedDict
+
+# Кэш выходов политики, ключ — (ключ Zobrist позиции, метка версии модели).
+# Каждый объект модели получает свою метку, поэтому модель, перезагруженная
+# из обновлённого файла весов, записей старых весов не находит; invalidate
+# удаляет записи модели, которая больше не нужна или сменила веса на месте.
+# Кэш защищён блокировкой для использования из нескольких потоков; у каждого
+# процесса пула свой кэш, его чистит workers.load_model_cached.
+
+
+class EvaluationCache:
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._tags = weakref.WeakKeyDictionary()
+        self._counter = itertools.count()
+        self.hits = 0
+        self.misses = 0
+
+    # Метка версии модели; объект модели, созданный заново, получает новую
+    def model_tag(self, model):
+        with self._lock:
+            tag = self._tags.get(model)
+            if tag is None:
+                tag = next(self._counter)
+                self._tags[model] = tag
+            return tag
+
+    # Веса модели изменились: выдать ей новую метку и удалить её записи
+    def invalidate(self, model):
+        with self._lock:
+            old_tag = self._tags.get(model)
+            self._tags[model] = next(self._counter)
+            if old_tag is not None:
+                for key in [key for key in self._entries if key[1] == old_tag]:
+                    del self._entries[key]
+
+    def get(self, position_key, tag):
+        with self._lock:
+            value = self._entries.get((position_key, tag))
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((position_key, tag))
+            self.hits += 1
+            return value
+
+    # Попадания, обслуженные вызывающим кодом без get (повтор позиции в одной пачке)
+    def record_hits(self, count=1):
+        with self._lock:
+            self.hits += count
+
+    def put(self, position_key, tag, value):
+        with self._lock:
+            self._entries[(position_key, tag)] = value
+            self._entries.move_to_end((position_key, tag))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hit_rate()}
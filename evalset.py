@@ -0,0 +1,79 @@
+import os
+import json
+import random
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from logic import Board
+from encoding import encode_board
+from engine import SearchEngine
+from policy import encode_move, legal_move_masks, pack_masks, unpack_masks
+
+# Постоянный набор позиций для сравнения моделей. Позиции получаются
+# случайными партиями с фиксированным зерном, эталонный ход — поиском
+# engine.SearchEngine с ограничением по узлам, поэтому набор воспроизводим.
+# Хранится в каталоге из файлов .npy и читается через отображение в память.
+DEFAULT_EVAL_PATH = os.path.join('eval', 'eval_set')
+
+
+def build_eval_set(path=DEFAULT_EVAL_PATH, num_positions=500, seed=0, min_plies=4, max_plies=60,
+                   node_limit=1000):
+    rng = random.Random(seed)
+    engine = SearchEngine()
+    states = []
+    masks = []
+    moves = []
+    while len(moves) < num_positions:
+        board = Board()
+        for _ in range(rng.randint(min_plies, max_plies)):
+            legal = list(board.legal_moves())
+            if not legal:
+                break
+            board.push(rng.choice(legal))
+        legal = list(board.legal_moves())
+        if not legal:
+            continue
+        # Чистая таблица транспозиций на каждую позицию, чтобы ход не зависел от порядка построения
+        engine.tt.clear()
+        move = engine.search(board, node_limit=node_limit)
+        states.append(encode_board(board, dtype=np.uint8))
+        masks.append(pack_masks(legal_move_masks([legal]))[0])
+        moves.append(encode_move(move))
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'states.npy'), np.array(states, dtype=np.uint8))
+    np.save(os.path.join(path, 'masks.npy'), np.array(masks, dtype=np.uint8))
+    np.save(os.path.join(path, 'moves.npy'), np.array(moves, dtype=np.int32))
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'num_positions': num_positions, 'seed': seed, 'node_limit': node_limit}, f)
+    return path
+
+
+# Загрузка набора: (состояния, упакованные маски, эталонные индексы ходов)
+def load_eval_set(path=DEFAULT_EVAL_PATH):
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        build_eval_set(path)
+    return tuple(np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ('states', 'masks', 'moves'))
+
+
+# Доля позиций, в которых самый вероятный ход модели совпал с эталонным
+def score_model(model, states, masks, moves, batch_size=1024):
+    hits = 0
+    for start in range(0, len(moves), batch_size):
+        inputs = [states[start:start + batch_size], masks[start:start + batch_size]]
+        probs = model(inputs, training=False).numpy()
+        hits += int(np.sum(np.argmax(probs, axis=1) == moves[start:start + batch_size]))
+    return hits / len(moves) if len(moves) else 0.0
+
+
+# Оценка всех моделей на одном наборе: файлы загружаются параллельно,
+# входы распаковываются один раз и общие для всех моделей
+def evaluate_models(model_files, path=DEFAULT_EVAL_PATH, load_workers=4):
+    import tensorflow as tf
+    states, packed_masks, moves = load_eval_set(path)
+    states = np.asarray(states, dtype=np.float32)
+    masks = unpack_masks(packed_masks)
+    moves = np.asarray(moves)
+    with ThreadPoolExecutor(max_workers=load_workers) as executor:
+        models = list(executor.map(tf.keras.models.load_model, model_files))
+    return {model_file: (model, score_model(model, states, masks, moves))
+            for model_file, model in zip(model_files, models)}
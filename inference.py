@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import numpy as np
+from encoding import encode_board, STATE_SHAPE
+from policy import POLICY_SIZE, encode_moves, legal_move_masks, masked_softmax
+
+# Быстрый инференс для интерактивной игры. Модель загружается один раз и
+# вызывается либо через tf.function с фиксированной сигнатурой (граф
+# строится один раз при загрузке), либо прямым проходом на NumPy по весам,
+# экспортированным в .npz рядом с файлом .keras. Для NumPy-варианта
+# TensorFlow не нужен вовсе, поэтому холодный старт занимает миллисекунды.
+
+
+# Экспорт свёрточных и полносвязных слоёв модели в .npz
+def export_numpy(model, npz_path):
+    import tensorflow as tf
+    layers = []
+    arrays = {}
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.Conv2D):
+            kind = 'conv'
+        elif isinstance(layer, tf.keras.layers.Dense):
+            kind = 'dense'
+        elif isinstance(layer, tf.keras.layers.Flatten):
+            layers.append({'kind': 'flatten'})
+            continue
+        else:
+            continue
+        kernel, bias = layer.get_weights()
+        name = f'layer{len(layers)}'
+        arrays[f'{name}_kernel'] = kernel
+        arrays[f'{name}_bias'] = bias
+        layers.append({'kind': kind, 'name': name, 'activation': layer.get_config()['activation']})
+    np.savez(npz_path, spec=np.array(json.dumps(layers)), **arrays)
+
+
+class NumpyPolicy:
+    def __init__(self, npz_path):
+        data = np.load(npz_path)
+        self.layers = []
+        for layer in json.loads(str(data['spec'])):
+            if layer['kind'] == 'flatten':
+                self.layers.append(('flatten', None, None, None))
+            else:
+                self.layers.append((layer['kind'], data[f"{layer['name']}_kernel"], data[f"{layer['name']}_bias"],
+                                    layer['activation']))
+
+    # Логиты политики для пачки состояний (N, 8, 8, 12)
+    def logits(self, states):
+        x = np.asarray(states, dtype=np.float32)
+        for kind, kernel, bias, activation in self.layers:
+            if kind == 'flatten':
+                x = x.reshape(len(x), -1)
+                continue
+            if kind == 'conv':
+                kh, kw = kernel.shape[:2]
+                windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))
+                x = np.einsum('nhwcij,ijco->nhwo', windows, kernel, optimize=True) + bias
+            else:
+                x = x @ kernel + bias
+            if activation == 'relu':
+                x = np.maximum(x, 0)
+        return x
+
+    def __call__(self, states, masks):
+        return masked_softmax(self.logits(states), masks)
+
+
+class InferenceModel:
+    # backend: 'numpy', 'tf' или 'auto' — NumPy, если экспорт весов свежее файла модели
+    def __init__(self, model_path, backend='auto', export=True):
+        start = time.perf_counter()
+        npz_path = os.path.splitext(model_path)[0] + '.npz'
+        if backend == 'auto':
+            fresh = os.path.exists(npz_path) and (model_path.endswith('.npz') or
+                                                  os.path.getmtime(npz_path) >= os.path.getmtime(model_path))
+            backend = 'numpy' if fresh else 'tf'
+        self.backend = backend
+        if backend == 'numpy':
+            self._forward = NumpyPolicy(npz_path)
+        else:
+            self._forward = self._load_tf(model_path, npz_path if export else None)
+        # Первый вызов входит в холодный старт: для tf.function в нём строится граф
+        self._forward(np.zeros((1,) + STATE_SHAPE, dtype=np.float32), np.ones((1, POLICY_SIZE), dtype=np.float32))
+        self.cold_start = time.perf_counter() - start
+        self.latencies = []
+
+    @staticmethod
+    def _load_tf(model_path, npz_path):
+        import tensorflow as tf
+        model = tf.keras.models.load_model(model_path)
+        if npz_path is not None:
+            export_numpy(model, npz_path)
+        signature = [tf.TensorSpec((None,) + STATE_SHAPE, tf.float32), tf.TensorSpec((None, POLICY_SIZE), tf.float32)]
+        compiled = tf.function(lambda states, masks: model([states, masks], training=False), input_signature=signature)
+        return lambda states, masks: compiled(states, masks).numpy()
+
+    # Вероятности допустимых ходов позиции, в порядке moves
+    def move_probabilities(self, board, moves=None):
+        start = time.perf_counter()
+        moves = list(board.legal_moves()) if moves is None else moves
+        if not moves:
+            return moves, np.zeros(0, dtype=np.float32)
+        states = encode_board(board)[None]
+        masks = legal_move_masks([moves])
+        probs = self._forward(states, masks)[0][encode_moves(moves)]
+        self.latencies.append(time.perf_counter() - start)
+        return moves, probs
+
+    def best_move(self, board):
+        moves, probs = self.move_probabilities(board)
+        return moves[int(np.argmax(probs))] if moves else None
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'backend': self.backend,
+            'cold_start_ms': self.cold_start * 1000,
+            'calls': len(latencies),
+            'mean_ms': float(latencies.mean()) if len(latencies) else 0.0,
+            'p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+        }
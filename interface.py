@@ -1,12 +1,24 @@
 import pygame
 import logging
 from logic import Board, Pawn, Knight, Bishop, Rook, Queen, King
+from async_engine import AsyncEngine
 
 logging.basicConfig(filename='chess_log.txt', level=logging.DEBUG, encoding='utf-8')
 
 # Константы
 WIDTH, HEIGHT = 640, 640
 SQUARE_SIZE = WIDTH // 8
+FPS = 60
+
+# Событие pygame с готовым ходом движка
+ENGINE_MOVE = pygame.USEREVENT + 1
+
+DRAW_REASONS = {
+    'stalemate': "пат",
+    'insufficient_material': "недостаточно материала",
+    'fifty_moves': "правило 50 ходов",
+    'repetition': "троекратное повторение",
+}
 
 # Загрузка изображений
 def load_images():
@@ -20,67 +32,151 @@ def load_images():
             )
     return images
 
+def square_rect(row, col):
+    return pygame.Rect(col*SQUARE_SIZE, row*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+
+# Доска без фигур рисуется один раз и дальше копируется по клеткам
+def render_background():
+    surface = pygame.Surface((WIDTH, HEIGHT))
+    colors = [pygame.Color('white'), pygame.Color('gray')]
+    for row in range(8):
+        for col in range(8):
+            pygame.draw.rect(surface, colors[(row + col) % 2], square_rect(row, col))
+    return surface
+
 class ChessGame:
-    def __init__(self):
+    # Человек играет цветом player_color, движок — противоположным. Движок
+    # думает в отдельном процессе и присылает ход событием ENGINE_MOVE,
+    # а на время хода человека ставится размышлять над текущей позицией.
+    def __init__(self, player_color='white', think_time=1.0, ponder=True):
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
         pygame.display.set_caption("Шахматы")
         self.clock = pygame.time.Clock()
         self.images = load_images()
+        self.background = render_background()
+        # Что сейчас нарисовано в каждой клетке: (фигура, подсветка)
+        self.drawn = {}
         self.board = Board()
         self.selected_piece = None
+        self.highlighted = set()
+        self.player_color = player_color
+        self.think_time = think_time
+        self.ponder = ponder
+        self.engine = AsyncEngine(self.post_engine_move)
+        self.pending_request = None
+        self.legal_moves = set(self.board.legal_moves())
+        self.game_over = False
 
+    # Перерисовываются только клетки, состояние которых изменилось с
+    # прошлого кадра; возвращаются их прямоугольники для display.update
     def draw_board(self):
-        colors = [pygame.Color('white'), pygame.Color('gray')]
+        rects = []
         for row in range(8):
             for col in range(8):
-                color = colors[(row + col) % 2]
-                pygame.draw.rect(self.screen, color, (col*SQUARE_SIZE, row*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
                 piece = self.board.board[row][col]
+                state = (self.image_key(piece) if piece else None, (row, col) in self.highlighted)
+                if self.drawn.get((row, col)) == state:
+                    continue
+                self.drawn[(row, col)] = state
+                rect = square_rect(row, col)
+                self.screen.blit(self.background, rect, rect)
                 if piece:
                     self.draw_piece(piece, col, row)
+                if state[1]:
+                    pygame.draw.rect(self.screen, pygame.Color('red'), rect, 3)
+                rects.append(rect)
+        return rects
+
+    @staticmethod
+    def image_key(piece):
+        return f'{piece.color}_{type(piece).__name__.lower()}'
 
     def draw_piece(self, piece, x, y):
-        piece_type = type(piece).__name__.lower()
-        piece_color = piece.color
-        self.screen.blit(self.images[f'{piece_color}_{piece_type}'], (x*SQUARE_SIZE, y*SQUARE_SIZE))
+        self.screen.blit(self.images[self.image_key(piece)], (x*SQUARE_SIZE, y*SQUARE_SIZE))
+
+    # Подсветка считается один раз при выборе фигуры из уже известных допустимых ходов
+    def select(self, square):
+        self.selected_piece = square
+        if square is None:
+            self.highlighted = set()
+        else:
+            self.highlighted = {move[1] for move in self.legal_moves if move[0] == square}
+
+    # Вызывается из потока AsyncEngine; event.post потокобезопасен
+    def post_engine_move(self, request_id, move, stats):
+        pygame.event.post(pygame.event.Event(ENGINE_MOVE, request_id=request_id, move=move, stats=stats))
+
+    # Ход на доске и проверка конца партии. Допустимые ходы нужны и для
+    # проверки кликов, поэтому вычисляются один раз на позицию.
+    def make_move(self, move):
+        self.board.push(move)
+        self.legal_moves = set(self.board.legal_moves())
+        result = self.board.outcome(bool(self.legal_moves))
+        if result is not None:
+            self.game_over = True
+            winner, reason = result
+            if winner is not None:
+                logging.info(f"Шах и мат! {'Белые' if winner == 'white' else 'Чёрные'} победили!")
+            else:
+                logging.info(f"Ничья: {DRAW_REASONS[reason]}")
+            self.engine.cancel()
+        elif self.board.current_turn == self.player_color:
+            if self.ponder:
+                self.engine.ponder(self.board)
+        else:
+            self.pending_request = self.engine.think(self.board, self.think_time)
 
-    def highlight_moves(self, piece, x, y):
-        for mx, my in piece.get_possible_moves(self.board.board, y, x):
-            pygame.draw.rect(self.screen, pygame.Color('red'), (my*SQUARE_SIZE, mx*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
+    def handle_click(self, pos):
+        x, y = pos[0] // SQUARE_SIZE, pos[1] // SQUARE_SIZE
+        logging.debug(f"Нажатие на клетку ({x}, {y})")
+        if self.game_over or self.board.current_turn != self.player_color:
+            return
+        if self.selected_piece:
+            move = (self.selected_piece, (y, x))
+            self.select(None)
+            # Превращение пешки по клику — всегда в ферзя
+            if move + (Queen,) in self.legal_moves:
+                move += (Queen,)
+            if move in self.legal_moves:
+                self.make_move(move)
+            else:
+                logging.error("Invalid move")
+        else:
+            piece = self.board.board[y][x]
+            if piece and piece.color == self.player_color:
+                self.select((y, x))
 
     def main_loop(self):
+        if self.board.current_turn != self.player_color:
+            self.pending_request = self.engine.think(self.board, self.think_time)
+        elif self.ponder:
+            self.engine.ponder(self.board)
+        # Движение мыши не меняет картинку и не должно будить цикл
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        self.screen.blit(self.background, (0, 0))
+        self.draw_board()
+        pygame.display.flip()
         running = True
         while running:
-            for event in pygame.event.get():
+            # Без событий цикл спит в event.wait; ход движка тоже приходит событием
+            for event in [pygame.event.wait()] + pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
-                    x, y = event.pos[0] // SQUARE_SIZE, event.pos[1] // SQUARE_SIZE
-                    logging.debug(f"Нажатие на клетку ({x}, {y})")
-                    if self.selected_piece:
-                        try:
-                            self.board.move_piece(self.selected_piece, (y, x))
-                            self.selected_piece = None
-                            if self.board.is_checkmate('black'):
-                                logging.info("Шах и мат! Белые победили!")
-                                running = False
-                            elif self.board.is_stalemate('black'):
-                                logging.info("Пат! Ничья!")
-                                running = False
-                        except ValueError as e:
-                            self.selected_piece = None
-                            logging.error(str(e))
-                    else:
-                        piece = self.board.board[y][x]
-                        if piece and piece.color == 'white':  # Или другой цвет в зависимости от выбранной стороны
-                            self.selected_piece = (y, x)
-            self.draw_board()
-            if self.selected_piece:
-                piece = self.board.board[self.selected_piece[0]][self.selected_piece[1]]
-                self.highlight_moves(piece, self.selected_piece[1], self.selected_piece[0])
-            pygame.display.flip()
-            self.clock.tick(60)
+                    self.handle_click(event.pos)
+                elif event.type == ENGINE_MOVE and event.request_id == self.pending_request:
+                    self.pending_request = None
+                    logging.debug(f"Ход движка {event.move}: {event.stats}")
+                    if event.move is not None:
+                        self.make_move(event.move)
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.drawn = {}
+            rects = self.draw_board()
+            if rects:
+                pygame.display.update(rects)
+            self.clock.tick(FPS)
+        self.engine.close()
         pygame.quit()
 
 if __name__ == "__main__":
@@ -1,5 +1,5 @@
-import numpy as np
 import random
+import metrics
 class Piece:
     def __init__(self, color):
         self.color = color
@@ -88,11 +88,66 @@ class King(Piece):
         return moves
 
 
+KNIGHT_OFFSETS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+KING_OFFSETS = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+# Направления лучей и фигуры, которые по ним бьют
+SLIDER_DIRECTIONS = [((dx, dy), (Rook, Queen)) for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]] + \
+                    [((dx, dy), (Bishop, Queen)) for dx, dy in [(1, 1), (1, -1), (-1, 1), (-1, -1)]]
+
+PIECE_INDEX = {Pawn: 0, Knight: 1, Bishop: 2, Rook: 3, Queen: 4, King: 5}
+FEN_PIECES = {'p': Pawn, 'n': Knight, 'b': Bishop, 'r': Rook, 'q': Queen, 'k': King}
+FEN_CHARS = {piece_type: char for char, piece_type in FEN_PIECES.items()}
+
+# Ключи Zobrist: случайное 64-битное число на каждую пару (фигура, клетка)
+# и на ход чёрных. Генератор с фиксированным зерном, чтобы ключи совпадали
+# между процессами и запусками.
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+
+# Права на рокировку — битовая маска: K, Q — белые в короткую и длинную сторону, k, q — чёрные
+CASTLING_FLAGS = {'K': 1, 'Q': 2, 'k': 4, 'q': 8}
+# Рокировка записывается ходом короля на две клетки: флаг -> (откуда король, куда король)
+CASTLING_MOVES = {1: ((7, 4), (7, 6)), 2: ((7, 4), (7, 2)), 4: ((0, 4), (0, 6)), 8: ((0, 4), (0, 2))}
+# Ход с этих клеток или на них (король или ладья ушли, ладью взяли) снимает права
+CASTLING_LOSS = {(7, 4): 3, (7, 7): 1, (7, 0): 2, (0, 4): 12, (0, 7): 4, (0, 0): 8}
+PROMOTION_PIECES = [Queen, Rook, Bishop, Knight]
+
+
+def zobrist_piece(piece, row, col):
+    idx = PIECE_INDEX[type(piece)] + (6 if piece.color == 'black' else 0)
+    return ZOBRIST_PIECES[idx][row * 8 + col]
+
+
+# Откуда и куда идёт ладья при рокировке королём с king_col на target_col
+def castling_rook_squares(row, king_col, target_col):
+    if target_col > king_col:
+        return (row, 7), (row, 5)
+    return (row, 0), (row, 3)
+
+
+def square_name(row, col):
+    return 'abcdefgh'[col] + str(8 - row)
+
+
 class Board:
     def __init__(self):
         self.board = [[None for _ in range(8)] for _ in range(8)]
         self.setup_board()
         self.current_turn = 'white'
+        # Стек отмены: (начальная клетка, конечная клетка, фигура, взятая фигура, чей был ход,
+        # ключ Zobrist, клетка взятой фигуры, права на рокировку, поле взятия на проходе,
+        # счётчик полуходов, фигура превращения)
+        self.move_stack = []
+        self.castling = 15
+        # Поле, через которое прошла пешка; хранится, только если взятие на проходе возможно
+        self.en_passant = None
+        # Полуходы с последнего хода пешкой или взятия — для правила 50 ходов
+        self.halfmove_clock = 0
+        self.start_fullmove = 1
+        self.zobrist_key = self.compute_zobrist()
 
     def setup_board(self):
         # Установка пешек
@@ -124,27 +179,380 @@ class Board:
         self.board[7][3] = Queen('white')
         self.board[7][4] = King('white')
 
-    def move_piece(self, start_pos, end_pos):
-        x1, y1 = start_pos
-        x2, y2 = end_pos
-        piece = self.board[x1][y1]
-        if piece and end_pos in piece.get_possible_moves(self.board, x1, y1):
-            self.board[x2][y2] = piece
-            self.board[x1][y1] = None
-            self.current_turn = 'black' if self.current_turn == 'white' else 'white'
-        else:
-            raise ValueError("Invalid move")
+    @classmethod
+    def from_fen(cls, fen):
+        board = cls()
+        board.set_fen(fen)
+        return board
 
-    def is_in_check(self, color):
-        king_pos = self.find_king(color)
+    # Загрузка позиции из FEN
+    def set_fen(self, fen):
+        fields = fen.split()
+        rows = fields[0].split('/')
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN: {fen}")
+        self.board = [[None for _ in range(8)] for _ in range(8)]
+        for row, rank in enumerate(rows):
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                elif char.lower() in FEN_PIECES and col < 8:
+                    color = 'white' if char.isupper() else 'black'
+                    self.board[row][col] = FEN_PIECES[char.lower()](color)
+                    col += 1
+                else:
+                    raise ValueError(f"Invalid FEN: {fen}")
+            if col != 8:
+                raise ValueError(f"Invalid FEN: {fen}")
+        self.current_turn = 'black' if len(fields) > 1 and fields[1] == 'b' else 'white'
+        castling = fields[2] if len(fields) > 2 else '-'
+        if castling != '-' and any(char not in CASTLING_FLAGS for char in castling):
+            raise ValueError(f"Invalid FEN: {fen}")
+        self.castling = sum(CASTLING_FLAGS[char] for char in set(castling) if char in CASTLING_FLAGS)
+        self.en_passant = None
+        if len(fields) > 3 and fields[3] != '-':
+            if len(fields[3]) != 2 or fields[3][0] not in 'abcdefgh' or fields[3][1] not in '36':
+                raise ValueError(f"Invalid FEN: {fen}")
+            row, col = 8 - int(fields[3][1]), 'abcdefgh'.index(fields[3][0])
+            self.en_passant = self._capturable_en_passant(row, col, self.current_turn)
+        self.halfmove_clock = int(fields[4]) if len(fields) > 4 and fields[4].isdigit() else 0
+        self.start_fullmove = int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else 1
+        self.move_stack = []
+        self.zobrist_key = self.compute_zobrist()
+
+    # Поле взятия на проходе, если пешка цвета color может на него бить, иначе None.
+    # Без этой проверки одинаковые позиции различались бы ключом Zobrist.
+    def _capturable_en_passant(self, row, col, color):
+        pawn_row = row + (1 if color == 'white' else -1)
+        for pawn_col in (col - 1, col + 1):
+            if 0 <= pawn_col < 8:
+                piece = self.board[pawn_row][pawn_col]
+                if type(piece) is Pawn and piece.color == color:
+                    return (row, col)
+        return None
+
+    # Права на рокировку по расстановке: король и ладья стоят на исходных клетках
+    def home_castling_rights(self):
+        rights = 0
+        for flag, (king_pos, target) in CASTLING_MOVES.items():
+            color = 'white' if king_pos[0] == 7 else 'black'
+            rook_pos = castling_rook_squares(king_pos[0], king_pos[1], target[1])[0]
+            king = self.board[king_pos[0]][king_pos[1]]
+            rook = self.board[rook_pos[0]][rook_pos[1]]
+            if type(king) is King and king.color == color and type(rook) is Rook and rook.color == color:
+                rights |= flag
+        return rights
+
+    def to_fen(self):
+        ranks = []
+        for row in self.board:
+            rank = ''
+            empty = 0
+            for piece in row:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                char = FEN_CHARS[type(piece)]
+                rank += char.upper() if piece.color == 'white' else char
+            ranks.append(rank + (str(empty) if empty else ''))
+        plies = len(self.move_stack)
+        started_black = (self.current_turn == 'black') == (plies % 2 == 0)
+        fullmove = self.start_fullmove + (plies + started_black) // 2
+        castling = ''.join(char for char, flag in CASTLING_FLAGS.items() if self.castling & flag) or '-'
+        en_passant = square_name(*self.en_passant) if self.en_passant is not None else '-'
+        return f"{'/'.join(ranks)} {self.current_turn[0]} {castling} {en_passant} {self.halfmove_clock} {fullmove}"
+
+    # Ход с проверкой по допустимым ходам; без указания фигуры пешка превращается в ферзя
+    def move_piece(self, start_pos, end_pos, promotion=None):
+        for move in self.legal_moves():
+            if move[0] == start_pos and move[1] == end_pos and (len(move) < 3 or move[2] is (promotion or Queen)):
+                self.push(move)
+                return
+        raise ValueError("Invalid move")
+
+    # Выполнение хода без проверки допустимости с возможностью отмены через pop().
+    # Ход пешки на последнюю горизонталь без третьего элемента — превращение в ферзя.
+    def push(self, move):
+        (x1, y1), (x2, y2) = move[0], move[1]
+        board = self.board
+        piece = board[x1][y1]
+        piece_type = type(piece)
+        captured = board[x2][y2]
+        capture_pos = (x2, y2)
+        promotion = None
+        key = self.zobrist_key ^ ZOBRIST_BLACK_TO_MOVE ^ ZOBRIST_CASTLING[self.castling]
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant[1]]
+        if piece_type is Pawn:
+            # Взятие на проходе: пешка уходит по диагонали на пустую клетку
+            if captured is None and y1 != y2:
+                capture_pos = (x1, y2)
+                captured = board[x1][y2]
+                board[x1][y2] = None
+            if x2 == 0 or x2 == 7:
+                promotion = move[2] if len(move) > 2 else Queen
+        self.move_stack.append((move[0], move[1], piece, captured, self.current_turn, self.zobrist_key,
+                                capture_pos, self.castling, self.en_passant, self.halfmove_clock, promotion))
+        if captured is not None:
+            key ^= zobrist_piece(captured, capture_pos[0], capture_pos[1])
+        moved = piece if promotion is None else promotion(piece.color)
+        key ^= zobrist_piece(piece, x1, y1) ^ zobrist_piece(moved, x2, y2)
+        board[x2][y2] = moved
+        board[x1][y1] = None
+        if piece_type is King and abs(y2 - y1) == 2:
+            (rx1, ry1), (rx2, ry2) = castling_rook_squares(x1, y1, y2)
+            rook = board[rx1][ry1]
+            board[rx2][ry2] = rook
+            board[rx1][ry1] = None
+            key ^= zobrist_piece(rook, rx1, ry1) ^ zobrist_piece(rook, rx2, ry2)
+        if self.castling:
+            self.castling &= ~(CASTLING_LOSS.get((x1, y1), 0) | CASTLING_LOSS.get((x2, y2), 0))
+        enemy = 'black' if self.current_turn == 'white' else 'white'
+        self.en_passant = None
+        if piece_type is Pawn and abs(x2 - x1) == 2:
+            self.en_passant = self._capturable_en_passant((x1 + x2) // 2, y1, enemy)
+            if self.en_passant is not None:
+                key ^= ZOBRIST_EN_PASSANT[y1]
+        self.halfmove_clock = 0 if piece_type is Pawn or captured is not None else self.halfmove_clock + 1
+        self.zobrist_key = key ^ ZOBRIST_CASTLING[self.castling]
+        self.current_turn = enemy
+
+    # Отмена последнего хода, сделанного через push()
+    def pop(self):
+        ((x1, y1), (x2, y2), piece, captured, turn, key, capture_pos, castling, en_passant, halfmove_clock,
+         promotion) = self.move_stack.pop()
+        board = self.board
+        board[x1][y1] = piece
+        board[x2][y2] = None
+        if captured is not None:
+            board[capture_pos[0]][capture_pos[1]] = captured
+        if type(piece) is King and abs(y2 - y1) == 2:
+            (rx1, ry1), (rx2, ry2) = castling_rook_squares(x1, y1, y2)
+            board[rx1][ry1] = board[rx2][ry2]
+            board[rx2][ry2] = None
+        self.current_turn = turn
+        self.zobrist_key = key
+        self.castling = castling
+        self.en_passant = en_passant
+        self.halfmove_clock = halfmove_clock
+        if promotion is not None:
+            return ((x1, y1), (x2, y2), promotion)
+        return ((x1, y1), (x2, y2))
+
+    # Полный пересчёт ключа Zobrist; нужен только после прямой записи в self.board
+    def compute_zobrist(self):
+        key = ZOBRIST_BLACK_TO_MOVE if self.current_turn == 'black' else 0
+        key ^= ZOBRIST_CASTLING[self.castling]
+        if self.en_passant is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant[1]]
         for row in range(8):
             for col in range(8):
                 piece = self.board[row][col]
-                if piece and piece.color != color:
-                    if king_pos in piece.get_possible_moves(self.board, row, col):
+                if piece is not None:
+                    key ^= zobrist_piece(piece, row, col)
+        return key
+
+    def is_in_check(self, color):
+        king_pos = self.find_king(color)
+        if king_pos is None:
+            return False
+        return self.is_square_attacked(king_pos, 'black' if color == 'white' else 'white')
+
+    # Атакована ли клетка фигурами цвета by_color: лучи расходятся от самой клетки,
+    # поэтому не нужно перебирать ходы всех фигур противника
+    def is_square_attacked(self, pos, by_color):
+        x, y = pos
+        board = self.board
+        for dx, dy in KNIGHT_OFFSETS:
+            mx, my = x + dx, y + dy
+            if 0 <= mx < 8 and 0 <= my < 8:
+                piece = board[mx][my]
+                if piece is not None and piece.color == by_color and type(piece) is Knight:
+                    return True
+        for dx, dy in KING_OFFSETS:
+            mx, my = x + dx, y + dy
+            if 0 <= mx < 8 and 0 <= my < 8:
+                piece = board[mx][my]
+                if piece is not None and piece.color == by_color and type(piece) is King:
+                    return True
+        # Пешка цвета by_color бьёт по диагонали на шаг в своём направлении
+        px = x + (1 if by_color == 'white' else -1)
+        if 0 <= px < 8:
+            for py in (y - 1, y + 1):
+                if 0 <= py < 8:
+                    piece = board[px][py]
+                    if piece is not None and piece.color == by_color and type(piece) is Pawn:
                         return True
+        for (dx, dy), sliders in SLIDER_DIRECTIONS:
+            mx, my = x + dx, y + dy
+            while 0 <= mx < 8 and 0 <= my < 8:
+                piece = board[mx][my]
+                if piece is not None:
+                    if piece.color == by_color and type(piece) in sliders:
+                        return True
+                    break
+                mx += dx
+                my += dy
         return False
 
+    # Шахующие фигуры и связки, найденные лучами от короля.
+    # Возвращает список (клетка шахующей фигуры, клетки между ней и королём)
+    # и словарь {клетка связанной фигуры: клетки линии связки, куда ей можно идти}.
+    def _checks_and_pins(self, color, king_pos):
+        x, y = king_pos
+        board = self.board
+        checkers = []
+        pins = {}
+        for dx, dy in KNIGHT_OFFSETS:
+            mx, my = x + dx, y + dy
+            if 0 <= mx < 8 and 0 <= my < 8:
+                piece = board[mx][my]
+                if piece is not None and piece.color != color and type(piece) is Knight:
+                    checkers.append(((mx, my), ()))
+        px = x + (-1 if color == 'white' else 1)
+        if 0 <= px < 8:
+            for py in (y - 1, y + 1):
+                if 0 <= py < 8:
+                    piece = board[px][py]
+                    if piece is not None and piece.color != color and type(piece) is Pawn:
+                        checkers.append(((px, py), ()))
+        for (dx, dy), sliders in SLIDER_DIRECTIONS:
+            line = []
+            pinned = None
+            mx, my = x + dx, y + dy
+            while 0 <= mx < 8 and 0 <= my < 8:
+                piece = board[mx][my]
+                if piece is None:
+                    line.append((mx, my))
+                elif piece.color == color:
+                    if pinned is not None:
+                        break
+                    pinned = (mx, my)
+                else:
+                    if type(piece) in sliders:
+                        if pinned is None:
+                            checkers.append(((mx, my), line))
+                        else:
+                            pins[pinned] = set(line) | {(mx, my)}
+                    break
+                mx += dx
+                my += dy
+        return checkers, pins
+
+    # Генератор допустимых ходов стороны, которая ходит. Шахи и связки
+    # вычисляются один раз на позицию, поэтому ход, оставляющий своего короля
+    # под боем, отсекается без пробного выполнения. Исключение — редкое взятие
+    # на проходе, которое может вскрыть линию по горизонтали: оно проверяется
+    # пробным ходом. Превращение даёт четыре хода с фигурой третьим элементом.
+    def legal_moves(self):
+        color = self.current_turn
+        enemy = 'black' if color == 'white' else 'white'
+        king_pos = self.find_king(color)
+        if king_pos is None:
+            yield from self.get_all_possible_moves()
+            return
+        checkers, pins = self._checks_and_pins(color, king_pos)
+        board = self.board
+        kx, ky = king_pos
+        king = board[kx][ky]
+
+        # Ходы короля: целевая клетка не должна быть под боем даже с учётом
+        # того, что сам король больше не заслоняет линию атаки
+        king_moves = []
+        board[kx][ky] = None
+        for target in king.get_possible_moves(board, kx, ky):
+            if not self.is_square_attacked(target, enemy):
+                king_moves.append(target)
+        board[kx][ky] = king
+        for target in king_moves:
+            yield (king_pos, target)
+
+        if len(checkers) > 1:
+            return
+        evasions = None
+        if checkers:
+            checker_pos, line = checkers[0]
+            evasions = set(line)
+            evasions.add(checker_pos)
+        elif self.castling:
+            yield from self._castling_moves(color, enemy, king_pos)
+
+        promotion_row = 0 if color == 'white' else 7
+        for row in range(8):
+            for col in range(8):
+                piece = board[row][col]
+                if piece is None or piece.color != color or piece is king:
+                    continue
+                allowed = pins.get((row, col))
+                promotes = type(piece) is Pawn
+                for target in piece.get_possible_moves(board, row, col):
+                    if allowed is not None and target not in allowed:
+                        continue
+                    if evasions is not None and target not in evasions:
+                        continue
+                    if promotes and target[0] == promotion_row:
+                        for promotion in PROMOTION_PIECES:
+                            yield ((row, col), target, promotion)
+                    else:
+                        yield ((row, col), target)
+
+        if self.en_passant is not None:
+            ex, ey = self.en_passant
+            pawn_row = ex + (1 if color == 'white' else -1)
+            for pawn_col in (ey - 1, ey + 1):
+                if 0 <= pawn_col < 8:
+                    piece = board[pawn_row][pawn_col]
+                    if type(piece) is Pawn and piece.color == color:
+                        move = ((pawn_row, pawn_col), (ex, ey))
+                        self.push(move)
+                        safe = not self.is_in_check(color)
+                        self.pop()
+                        if safe:
+                            yield move
+
+    # Рокировки; вызывается, только когда короля не шахуют
+    def _castling_moves(self, color, enemy, king_pos):
+        board = self.board
+        for flag in ((1, 2) if color == 'white' else (4, 8)):
+            if not self.castling & flag:
+                continue
+            king_from, king_to = CASTLING_MOVES[flag]
+            if king_pos != king_from:
+                continue
+            row = king_from[0]
+            (_, rook_col), _ = castling_rook_squares(row, king_from[1], king_to[1])
+            rook = board[row][rook_col]
+            if type(rook) is not Rook or rook.color != color:
+                continue
+            low, high = sorted((king_from[1], rook_col))
+            if any(board[row][col] is not None for col in range(low + 1, high)):
+                continue
+            # Король не проходит через битое поле и не встаёт на него
+            step = 1 if king_to[1] > king_from[1] else -1
+            if any(self.is_square_attacked((row, col), enemy) for col in (king_from[1] + step, king_to[1])):
+                continue
+            yield (king_from, king_to)
+
+    # Право взятия на проходе есть только у стороны, чья очередь хода
+    def _has_legal_move(self, color):
+        turn, en_passant = self.current_turn, self.en_passant
+        if color != turn:
+            self.current_turn = color
+            self.en_passant = None
+        try:
+            for _ in self.legal_moves():
+                return True
+            return False
+        finally:
+            self.current_turn, self.en_passant = turn, en_passant
+
+    def is_check(self):
+        return self.is_in_check(self.current_turn)
+
     def find_king(self, color):
         for row in range(8):
             for col in range(8):
@@ -153,43 +561,69 @@ class Board:
                     return (row, col)
         return None
 
-    def is_checkmate(self, color):
-        if not self.is_in_check(color):
-            return False
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece.color == color:
-                    for move in piece.get_possible_moves(self.board, row, col):
-                        original_piece = self.board[move[0]][move[1]]
-                        self.board[move[0]][move[1]] = piece
-                        self.board[row][col] = None
-                        if not self.is_in_check(color):
-                            self.board[move[0]][move[1]] = original_piece
-                            self.board[row][col] = piece
-                            return False
-                        self.board[move[0]][move[1]] = original_piece
-                        self.board[row][col] = piece
-        return True
-
-    def is_stalemate(self, color):
-        if self.is_in_check(color):
-            return False
+    @metrics.timed('checkmate_scan')
+    def is_checkmate(self, color=None):
+        color = color or self.current_turn
+        return self.is_in_check(color) and not self._has_legal_move(color)
+
+    @metrics.timed('checkmate_scan')
+    def is_stalemate(self, color=None):
+        color = color or self.current_turn
+        return not self.is_in_check(color) and not self._has_legal_move(color)
+
+    # Сколько раз встречалась текущая позиция. Ключи прошлых позиций лежат в
+    # стеке отмены; смотреть дальше последнего необратимого хода (взятия или
+    # хода пешкой) не нужно, и сравниваются только позиции с тем же ходом.
+    def repetition_count(self):
+        key = self.zobrist_key
+        stack = self.move_stack
+        count = 1
+        for i in range(2, min(self.halfmove_clock, len(stack)) + 1, 2):
+            if stack[-i][5] == key:
+                count += 1
+        return count
+
+    def is_repetition(self, count=3):
+        return self.repetition_count() >= count
+
+    def is_fifty_moves(self):
+        return self.halfmove_clock >= 100
+
+    # Ни одна сторона не может поставить мат: только короли и не больше одной
+    # лёгкой фигуры, либо только слоны, все на полях одного цвета
+    def is_insufficient_material(self):
+        minors = []
         for row in range(8):
             for col in range(8):
                 piece = self.board[row][col]
-                if piece and piece.color == color:
-                    for move in piece.get_possible_moves(self.board, row, col):
-                        original_piece = self.board[move[0]][move[1]]
-                        self.board[move[0]][move[1]] = piece
-                        self.board[row][col] = None
-                        if not self.is_in_check(color):
-                            self.board[move[0]][move[1]] = original_piece
-                            self.board[row][col] = piece
-                            return False
-                        self.board[move[0]][move[1]] = original_piece
-                        self.board[row][col] = piece
-        return True
+                if piece is None or type(piece) is King:
+                    continue
+                if type(piece) in (Pawn, Rook, Queen):
+                    return False
+                minors.append((type(piece), (row + col) % 2))
+        if len(minors) <= 1:
+            return True
+        return all(piece_type is Bishop for piece_type, _ in minors) and len({shade for _, shade in minors}) == 1
+
+    # Итог партии: None, пока она продолжается, иначе (победитель или None
+    # при ничьей, причина). has_moves передаётся, если допустимые ходы уже
+    # посчитаны; max_plies — предел длины партии в полуходах.
+    def outcome(self, has_moves=None, max_plies=None):
+        if has_moves is None:
+            has_moves = self._has_legal_move(self.current_turn)
+        if not has_moves:
+            if self.is_check():
+                return ('black' if self.current_turn == 'white' else 'white'), 'checkmate'
+            return None, 'stalemate'
+        if self.is_insufficient_material():
+            return None, 'insufficient_material'
+        if self.is_fifty_moves():
+            return None, 'fifty_moves'
+        if self.is_repetition():
+            return None, 'repetition'
+        if max_plies is not None and len(self.move_stack) >= max_plies:
+            return None, 'max_plies'
+        return None
 
     def get_all_possible_moves(self):
         moves = []
@@ -204,6 +638,7 @@ class Board:
 
     def randomize(self):
         self.board = [[None for _ in range(8)] for _ in range(8)]  # Очистка инициализации доски
+        self.move_stack = []
 
         piece_types = [Pawn, Knight, Bishop, Rook, Queen, King]
         starting_rows = {'white': 0, 'black': 7}
@@ -222,6 +657,7 @@ class Board:
                 while self.board[row][column] is not None:
                     column = random.randint(0, 7)
                 self.board[row][column] = piece_type(color)
-
-
-
+        self.castling = 0
+        self.en_passant = None
+        self.halfmove_clock = 0
+        self.zobrist_key = self.compute_zobrist()
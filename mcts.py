@@ -0,0 +1,203 @@
+import math
+import time
+import numpy as np
+from encoding import encode_board
+from engine import evaluate
+from policy import encode_moves, legal_move_masks
+
+
+# Оценка листа с точки зрения стороны, которая в нём ходит, в диапазоне (-1, 1).
+# У модели пока только голова политики, поэтому значение даёт статическая оценка.
+def material_value(board):
+    return math.tanh(evaluate(board) / 400)
+
+
+class Node:
+    __slots__ = ('prior', 'visits', 'value_sum', 'children', 'terminal_value')
+
+    def __init__(self, prior):
+        self.prior = prior
+        self.visits = 0
+        # Сумма оценок с точки зрения игрока, сделавшего ход в этот узел
+        self.value_sum = 0.0
+        self.children = None
+        self.terminal_value = None
+
+    def q(self):
+        return self.value_sum / self.visits if self.visits else 0.0
+
+
+# Лист, ожидающий оценки моделью: путь от корня, допустимые ходы и входы модели
+class PendingLeaf:
+    __slots__ = ('node', 'path', 'moves', 'state', 'mask', 'value')
+
+    def __init__(self, node, path, moves, state, mask, value):
+        self.node = node
+        self.path = path
+        self.moves = moves
+        self.state = state
+        self.mask = mask
+        self.value = value
+
+
+class MCTS:
+    # Поиск по дереву Монте-Карло с выбором PUCT и априорными вероятностями
+    # из политики модели. За один шаг collect_leaves набирает несколько листьев:
+    # виртуальная потеря на уже выбранном пути уводит следующие спуски в другие
+    # ветви, и все листья оцениваются одним пакетным вызовом модели.
+    def __init__(self, simulations=200, leaves_per_step=16, c_puct=1.5, dirichlet_alpha=0.3,
+                 dirichlet_epsilon=0.25, add_noise=True, virtual_loss=1, value_fn=material_value):
+        self.simulations = simulations
+        self.leaves_per_step = leaves_per_step
+        self.c_puct = c_puct
+        self.dirichlet_alpha = dirichlet_alpha
+        self.dirichlet_epsilon = dirichlet_epsilon
+        self.add_noise = add_noise
+        self.virtual_loss = virtual_loss
+        self.value_fn = value_fn
+        self.root = Node(1.0)
+        self.root_noised = False
+        self.total_simulations = 0
+        self.total_time = 0.0
+
+    @property
+    def simulations_per_second(self):
+        return self.total_simulations / self.total_time if self.total_time > 0 else 0.0
+
+    def stats(self):
+        return {'simulations': self.total_simulations, 'time': self.total_time,
+                'simulations_per_second': self.simulations_per_second}
+
+    def search_done(self):
+        return self.root.visits >= self.simulations
+
+    def _select_child(self, node):
+        sqrt_visits = math.sqrt(max(1, node.visits))
+        best_score = -math.inf
+        best = None
+        for move, child in node.children.items():
+            score = child.q() + self.c_puct * child.prior * sqrt_visits / (1 + child.visits)
+            if score > best_score:
+                best_score = score
+                best = (move, child)
+        return best
+
+    # Спуск от корня до нераскрытых листьев. Терминальные позиции оцениваются
+    # сразу; возвращаются листья, которым нужна оценка модели.
+    def collect_leaves(self, board, count=None):
+        start = time.perf_counter()
+        count = self.leaves_per_step if count is None else count
+        leaves = []
+        pending = set()
+        for _ in range(count):
+            node = self.root
+            path = [node]
+            while node.children and node.terminal_value is None:
+                move, node = self._select_child(node)
+                board.push(move)
+                path.append(node)
+                node.visits += self.virtual_loss
+                node.value_sum -= self.virtual_loss
+
+            leaf = None
+            if node.terminal_value is None and id(node) not in pending:
+                moves = list(board.legal_moves())
+                result = board.outcome(bool(moves))
+                if result is None:
+                    mask = legal_move_masks([moves])[0]
+                    leaf = PendingLeaf(node, path, moves, encode_board(board), mask, self.value_fn(board))
+                else:
+                    # Мат — проигрыш стороны, которая ходит; любая ничья — 0
+                    node.terminal_value = -1.0 if result[1] == 'checkmate' else 0.0
+            for _ in range(len(path) - 1):
+                board.pop()
+
+            if leaf is not None:
+                pending.add(id(node))
+                leaves.append(leaf)
+            elif node.terminal_value is not None:
+                self._backpropagate(path, node.terminal_value)
+                self.total_simulations += 1
+            else:
+                # Лист уже ждёт оценки в этой пачке: снимаем виртуальную потерю
+                # и заканчиваем набор, чтобы не спускаться в него повторно
+                self._revert_virtual_loss(path)
+                break
+        self.total_time += time.perf_counter() - start
+        return leaves
+
+    # Раскрытие листьев по выходу модели (N, POLICY_SIZE) и обратное распространение
+    def expand(self, leaves, batch_probs):
+        start = time.perf_counter()
+        for leaf, probs in zip(leaves, batch_probs):
+            priors = np.asarray(probs)[encode_moves(leaf.moves)].astype(np.float64)
+            total = priors.sum()
+            priors = priors / total if total > 0 else np.full(len(leaf.moves), 1.0 / len(leaf.moves))
+            if leaf.node is self.root and self.add_noise:
+                priors = self._noisy(priors)
+                self.root_noised = True
+            leaf.node.children = {move: Node(float(p)) for move, p in zip(leaf.moves, priors)}
+            self._backpropagate(leaf.path, leaf.value)
+            self.total_simulations += 1
+        self.total_time += time.perf_counter() - start
+
+    def _noisy(self, priors):
+        noise = np.random.dirichlet([self.dirichlet_alpha] * len(priors))
+        return (1 - self.dirichlet_epsilon) * priors + self.dirichlet_epsilon * noise
+
+    def _revert_virtual_loss(self, path):
+        for node in path[1:]:
+            node.visits -= self.virtual_loss
+            node.value_sum += self.virtual_loss
+
+    # value — оценка с точки зрения стороны, которая ходит в последнем узле пути
+    def _backpropagate(self, path, value):
+        self._revert_virtual_loss(path)
+        for node in reversed(path):
+            value = -value
+            node.visits += 1
+            node.value_sum += value
+
+    # Полный поиск для одной партии; evaluate_fn(states, masks) -> вероятности.
+    # Время инференса входит в total_time, поэтому simulations_per_second —
+    # полная стоимость симуляции.
+    def run(self, board, evaluate_fn):
+        while not self.search_done():
+            leaves = self.collect_leaves(board)
+            if leaves:
+                start = time.perf_counter()
+                batch_probs = evaluate_fn(np.stack([leaf.state for leaf in leaves]),
+                                          np.stack([leaf.mask for leaf in leaves]))
+                self.total_time += time.perf_counter() - start
+                self.expand(leaves, batch_probs)
+            elif not self.root.children:
+                break
+        return self.root
+
+    # Выбор хода по числу посещений: при temperature 0 — самый посещаемый,
+    # иначе случайно пропорционально visits ** (1 / temperature)
+    def choose_move(self, temperature=0.0):
+        moves = list(self.root.children)
+        visits = np.array([self.root.children[m].visits for m in moves], dtype=np.float64)
+        if temperature <= 0 or visits.sum() == 0:
+            return moves[int(np.argmax(visits))]
+        weights = visits ** (1.0 / temperature)
+        return moves[np.random.choice(len(moves), p=weights / weights.sum())]
+
+    # Переход к поддереву сделанного хода: накопленная статистика сохраняется
+    def advance(self, move):
+        child = self.root.children.get(move) if self.root.children else None
+        self.root = child if child is not None else Node(1.0)
+        self.root_noised = False
+        if self.root.children and self.add_noise:
+            moves = list(self.root.children)
+            priors = self._noisy(np.array([self.root.children[m].prior for m in moves]))
+            for move, prior in zip(moves, priors):
+                self.root.children[move].prior = float(prior)
+            self.root_noised = True
+
+
+# Расписание температуры: первые temperature_moves полуходов выбор случайный
+# пропорционально посещениям, дальше — самый посещаемый ход
+def temperature_for_ply(ply, temperature_moves=30):
+    return 1.0 if ply < temperature_moves else 0.0
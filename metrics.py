@@ -0,0 +1,185 @@
+import os
+import csv
+import json
+import time
+import cProfile
+import contextlib
+
+# Счётчики и таймеры горячих участков самообучения. Включаются переменной
+# окружения CHESS_METRICS=1; процессы пула запускаются через spawn и
+# наследуют её вместе с окружением. Выключенные таймеры — общий пустой
+# контекст, а декоратор timed при выключенных метриках возвращает функцию
+# без обёртки, так что в обычном запуске накладных расходов нет.
+#
+# Процессы пула отдают накопленное вместе с результатом задачи (collect),
+# главный процесс складывает это в общие итоги и по процессам (merge) и
+# раз в CHESS_METRICS_INTERVAL секунд пишет их в CHESS_METRICS_FILE:
+# .json — последний снимок целиком, .csv — строки дописываются в конец,
+# чтобы сравнивать скорость между запусками и версиями.
+#
+# CHESS_PROFILE=<каталог> дополнительно включает cProfile в участках
+# profiled(); файлы .prof открываются через pstats или snakeviz. Для py-spy
+# ничего включать не нужно: процессы пула видны по pid из снимка метрик.
+
+ENABLED = os.environ.get('CHESS_METRICS', '') not in ('', '0')
+PROFILE_DIR = os.environ.get('CHESS_PROFILE') or None
+DUMP_PATH = os.environ.get('CHESS_METRICS_FILE', 'metrics.json')
+DUMP_INTERVAL = float(os.environ.get('CHESS_METRICS_INTERVAL', '30'))
+
+_counters = {}
+# Таймеры: имя -> [число вызовов, суммарное время в секундах]
+_timers = {}
+_workers = {}
+_started = time.time()
+_last_dump = time.perf_counter()
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def enable(enabled=True):
+    global ENABLED
+    ENABLED = enabled
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        timer = _timers.get(self.name)
+        if timer is None:
+            timer = _timers[self.name] = [0, 0.0]
+        timer[0] += 1
+        timer[1] += time.perf_counter() - self.start
+        return False
+
+
+def timer(name):
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def count(name, n=1):
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+# Декоратор для функций (не генераторов); решение принимается при импорте
+def timed(name):
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        def wrapper(*args, **kwargs):
+            with _Timer(name):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__wrapped__ = func
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    return {'pid': os.getpid(), 'counters': dict(_counters),
+            'timers': {name: list(value) for name, value in _timers.items()}}
+
+
+def reset():
+    _counters.clear()
+    _timers.clear()
+    _workers.clear()
+
+
+# Снимок процесса с обнулением; вызывается в процессе пула в конце задачи
+def collect():
+    result = snapshot()
+    _counters.clear()
+    _timers.clear()
+    return result
+
+
+def _add(target, data):
+    counters = target.setdefault('counters', {})
+    for name, value in data['counters'].items():
+        counters[name] = counters.get(name, 0) + value
+    timers = target.setdefault('timers', {})
+    for name, (calls, seconds) in data['timers'].items():
+        timer = timers.setdefault(name, [0, 0.0])
+        timer[0] += calls
+        timer[1] += seconds
+
+
+# Добавление снимка процесса пула к итогам главного процесса
+def merge(data):
+    if not data:
+        return
+    _add({'counters': _counters, 'timers': _timers}, data)
+    _add(_workers.setdefault(data['pid'], {}), data)
+
+
+def report():
+    elapsed = time.time() - _started
+    rates = {}
+    for name in ('games', 'positions', 'inference_positions', 'train_positions'):
+        if name in _counters and elapsed > 0:
+            rates[f'{name}_per_s'] = _counters[name] / elapsed
+    return {'time': time.time(), 'elapsed': elapsed, 'rates': rates,
+            'totals': snapshot(), 'workers': {str(pid): data for pid, data in _workers.items()}}
+
+
+def dump(path=None):
+    path = path or DUMP_PATH
+    data = report()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if path.endswith('.csv'):
+        new_file = not os.path.exists(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(['time', 'worker', 'name', 'calls', 'value'])
+            sources = [('total', data['totals'])] + list(data['workers'].items())
+            for worker, source in sources:
+                for name, value in source['counters'].items():
+                    writer.writerow([f"{data['time']:.0f}", worker, name, value, ''])
+                for name, (calls, seconds) in source['timers'].items():
+                    writer.writerow([f"{data['time']:.0f}", worker, name, calls, f'{seconds:.6f}'])
+            for name, value in data['rates'].items():
+                writer.writerow([f"{data['time']:.0f}", 'total', name, '', f'{value:.3f}'])
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2)
+    return data
+
+
+# Периодическая запись; вызывается из главного цикла обучения
+def maybe_dump(path=None, force=False):
+    global _last_dump
+    if not ENABLED:
+        return None
+    now = time.perf_counter()
+    if not force and now - _last_dump < DUMP_INTERVAL:
+        return None
+    _last_dump = now
+    return dump(path)
+
+
+# Профилирование участка cProfile, если задан CHESS_PROFILE
+@contextlib.contextmanager
+def profiled(name):
+    if PROFILE_DIR is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(PROFILE_DIR, f'{name}_{os.getpid()}.prof'))
@@ -1,145 +1,349 @@
-import tensorflow as tf
 import numpy as np
 import random
 import os
+import time
+import tempfile
+import metrics
 from logic import Board, Pawn, Knight, Bishop, Rook, Queen, King
-from multiprocessing import Pool, cpu_count
+from backend import tf
+from encoding import STATE_SHAPE, encode_board, encode_push
+from policy import POLICY_SIZE, encode_move, encode_moves, legal_move_masks, pack_masks
+from replay import ReplayBuffer
+from evalcache import EvaluationCache
+from mcts import MCTS, temperature_for_ply
+from evalset import DEFAULT_EVAL_PATH, evaluate_models
+from multiprocessing import cpu_count
+from workers import SelfPlayPool
+from tournament import Tournament, paired_openings, play_games
 
-# Построение модели
+# Кэш выходов политики на процесс, см. evalcache.py
+evaluation_cache = EvaluationCache()
+
+# Предел длины партии самообучения в полуходах: партия, не закончившаяся по
+# правилам, после него считается ничьей
+MAX_GAME_PLIES = 300
+
+# Построение модели. Выход — вероятности по фиксированной нумерации ходов из
+# policy.py; второй вход — маска допустимых ходов, которая ещё до softmax
+# переводит логиты недопустимых ходов в -1e9, одинаково при обучении и игре.
 def build_model():
-    model = tf.keras.Sequential([
-        tf.keras.layers.Conv2D(64, (3, 3), activation='relu', input_shape=(8, 8, 12)),
-        tf.keras.layers.Conv2D(64, (3, 3), activation='relu'),
-        tf.keras.layers.Flatten(),
-        tf.keras.layers.Dense(128, activation='relu'),
-        tf.keras.layers.Dense(64, activation='relu'),
-        tf.keras.layers.Dense(64, activation='relu'),
-        tf.keras.layers.Dense(64, activation='softmax')  # Softmax для предсказания вероятности каждого возможного хода
-    ])
+    board_input = tf.keras.Input(shape=(8, 8, 12), name='board')
+    mask_input = tf.keras.Input(shape=(POLICY_SIZE,), name='legal_mask')
+    x = tf.keras.layers.Conv2D(64, (3, 3), activation='relu')(board_input)
+    x = tf.keras.layers.Conv2D(64, (3, 3), activation='relu')(x)
+    x = tf.keras.layers.Flatten()(x)
+    x = tf.keras.layers.Dense(128, activation='relu')(x)
+    x = tf.keras.layers.Dense(64, activation='relu')(x)
+    x = tf.keras.layers.Dense(64, activation='relu')(x)
+    logits = tf.keras.layers.Dense(POLICY_SIZE)(x)
+    penalty = tf.keras.layers.Rescaling(1e9, offset=-1e9)(mask_input)
+    probs = tf.keras.layers.Softmax()(tf.keras.layers.Add()([logits, penalty]))
+    model = tf.keras.Model([board_input, mask_input], probs)
     model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
     return model
 
-# Получение состояния доски
-def get_board_state(board):
-    state = np.zeros((8, 8, 12), dtype=int)
-    piece_to_index = {
-        'Pawn': 0, 'Knight': 1, 'Bishop': 2, 'Rook': 3, 'Queen': 4, 'King': 5
-    }
-    for x in range(8):
-        for y in range(8):
-            piece = board.board[x][y]
-            if piece is not None:
-                idx = piece_to_index[type(piece).__name__]
-                if piece.color == 'black':
-                    idx += 6
-                state[x, y, idx] = 1
-    return state
-
-# Самообучение для одной пары моделей
-def self_play_for_pair(pair_index, model1, model2, num_games=1000):
-    train_X1 = []
-    train_y1 = []
-    train_X2 = []
-    train_y2 = []
-
-    for game in range(num_games):
-        board = Board()
-        current_models = [model1, model2]
-        random.shuffle(current_models)  # Случайный выбор порядка игроков
-        move_history = []
-
-        while not board.is_checkmate(board.current_turn) and not board.is_stalemate(board.current_turn):
-            player = board.current_turn
-            model_idx = 0 if player == 'white' else 1
-            state = get_board_state(board)
-            move_probs = current_models[model_idx].predict(np.expand_dims(state, axis=0))[0]
-            possible_moves = board.get_all_possible_moves()
-            move_idx = np.argmax(move_probs[:len(possible_moves)])
-            move = possible_moves[move_idx]
-            board.move_piece(move[0], move[1])
-            move_history.append((state, move))
-
-        # Обработка результата игры
-        if board.is_checkmate('white') or board.is_checkmate('black'):
-            winner = 'black' if board.current_turn == 'white' else 'white'
-            for state, move in move_history:
-                if winner == 'white':
-                    train_X1.append(state)
-                    train_y1.append(move)
-                else:
-                    train_X2.append(state)
-                    train_y2.append(move)
-        elif board.is_stalemate('white') or board.is_stalemate('black'):
-            # При пате никто не получает очков
-            continue
+# Получение состояния доски. uint8 занимает в 8 раз меньше памяти, чем int64,
+# а в модель пачка всё равно передаётся как float32.
+def get_board_state(board, out=None):
+    return encode_board(board, out=out, dtype=np.uint8)
+
+# Один прямой проход модели по пачке позиций. Прямой вызов model(x, training=False)
+# обходится без накладных расходов model.predict на каждый вызов.
+def predict_batch(model, states, masks):
+    inputs = [np.asarray(states, dtype=np.float32), np.asarray(masks, dtype=np.float32)]
+    return model(inputs, training=False).numpy()
+
+
+# Партия самообучения, ожидающая своей очереди на инференс
+# planes — закодированная позиция партии; после каждого хода обновляются
+# только изменившиеся клетки (encoding.encode_push)
+class SelfPlayGame:
+    def __init__(self, models):
+        self.board = Board()
+        self.planes = get_board_state(self.board)
+        self.models = models
+        self.move_history = []
+        self.possible_moves = None
+
+
+# Самообучение для одной пары моделей. parallel_games партий идут синхронно:
+# на каждом шаге позиции всех активных партий собираются в одну пачку на
+# модель, прогоняются одним вызовом и результаты раздаются обратно по партиям.
+# Возвращает данные партий, выигранных белыми и чёрными:
+# (состояния, упакованные маски, индексы ходов, результаты для ходившей стороны).
+# Повторяющиеся позиции берутся из кэша оценок и в инференс не попадают.
+# Пачки позиций и масок собираются в буферы, выделенные один раз на вызов.
+# При mcts_simulations > 0 ходы выбираются поиском MCTS, см. self_play_mcts.
+def self_play_for_pair(pair_index, model1, model2, num_games=1000, parallel_games=32, cache=None,
+                       mcts_simulations=0, max_plies=MAX_GAME_PLIES):
+    if mcts_simulations > 0:
+        return self_play_mcts(pair_index, model1, model2, num_games, parallel_games, simulations=mcts_simulations,
+                              max_plies=max_plies)
+    cache = evaluation_cache if cache is None else cache
+    train_data1 = ([], [], [], [])
+    train_data2 = ([], [], [], [])
+
+    states_buffer = np.zeros((parallel_games,) + STATE_SHAPE, dtype=np.uint8)
+    masks_buffer = np.zeros((parallel_games, POLICY_SIZE), dtype=np.float32)
+
+    start_time = time.perf_counter()
+    games_left = num_games
+    active = []
+    while games_left or active:
+        while games_left and len(active) < parallel_games:
+            current_models = [model1, model2]
+            random.shuffle(current_models)  # Случайный выбор порядка игроков
+            active.append(SelfPlayGame(current_models))
+            games_left -= 1
+
+        # Позиции, ожидающие хода, сгруппированные по модели
+        pending = {id(model1): (model1, []), id(model2): (model2, [])}
+        still_active = []
+        for game in active:
+            # Одного прохода генератора допустимых ходов достаточно, чтобы понять, окончена ли партия
+            with metrics.timer('movegen'):
+                game.possible_moves = list(game.board.legal_moves())
+            with metrics.timer('check'):
+                result = game.board.outcome(bool(game.possible_moves), max_plies)
+            if result is not None:
+                finish_game(game, result, train_data1, train_data2)
+                continue
+            model_idx = 0 if game.board.current_turn == 'white' else 1
+            pending[id(game.models[model_idx])][1].append(game)
+            still_active.append(game)
+        active = still_active
+
+        for model, games in pending.values():
+            if not games:
+                continue
+            with metrics.timer('encode'):
+                states = np.stack([game.planes for game in games], out=states_buffer[:len(games)])
+                masks = legal_move_masks([game.possible_moves for game in games], out=masks_buffer)[:len(games)]
+            tag = cache.model_tag(model)
+            # Вероятности допустимых ходов в порядке game.possible_moves. Одна и
+            # та же позиция может встретиться в пачке несколько раз (жадные модели
+            # играют одинаково): в инференс она попадает один раз, остальные
+            # партии получают тот же результат и считаются попаданиями.
+            legal_probs = [None] * len(games)
+            misses = {}
+            for i, game in enumerate(games):
+                key = game.board.zobrist_key
+                if key in misses:
+                    misses[key].append(i)
+                    cache.record_hits()
+                    continue
+                legal_probs[i] = cache.get(key, tag)
+                if legal_probs[i] is None:
+                    misses[key] = [i]
+            if misses:
+                first = [indices[0] for indices in misses.values()]
+                with metrics.timer('inference'):
+                    batch_probs = predict_batch(model, states[first], masks[first])
+                metrics.count('inference_positions', len(first))
+                for (key, indices), move_probs in zip(misses.items(), batch_probs):
+                    probs = move_probs[encode_moves(games[indices[0]].possible_moves)]
+                    cache.put(key, tag, probs)
+                    for i in indices:
+                        legal_probs[i] = probs
+            packed_masks = pack_masks(masks)
+            for game, packed_mask, probs in zip(games, packed_masks, legal_probs):
+                move = game.possible_moves[int(np.argmax(probs))]
+                # Буферы пачки переписываются на следующем шаге, в историю идёт копия
+                game.move_history.append((game.planes.copy(), packed_mask, encode_move(move), game.board.current_turn))
+                game.board.push(move)
+                encode_push(game.planes, game.board)
+
+    elapsed = time.perf_counter() - start_time
+    if elapsed > 0:
+        print(f"Пара {pair_index}: {num_games} партий за {elapsed:.1f} с ({num_games * 3600 / elapsed:.0f} партий/ч), "
+              f"попаданий в кэш оценок {cache.hit_rate():.1%}")
+    return train_data1, train_data2
+
 
-    return train_X1, train_y1, train_X2, train_y2
+# Самообучение с поиском MCTS вместо жадного выбора хода. У каждой партии по
+# дереву на сторону, поддеревья переиспользуются между ходами. На каждом шаге
+# листья всех деревьев, ждущих одну и ту же модель, оцениваются одной пачкой.
+def self_play_mcts(pair_index, model1, model2, num_games=1000, parallel_games=32,
+                   simulations=100, leaves_per_step=8, max_plies=MAX_GAME_PLIES):
+    train_data1 = ([], [], [], [])
+    train_data2 = ([], [], [], [])
 
-# Обучение одной пары моделей
-def train_pair(pair_index):
-    model1 = build_model()
-    model2 = build_model()
-    train_X1, train_y1, train_X2, train_y2 = self_play_for_pair(pair_index, model1, model2, num_games=10)
+    start_time = time.perf_counter()
+    total_simulations = 0
+    games_left = num_games
+    active = []
+    while games_left or active:
+        while games_left and len(active) < parallel_games:
+            current_models = [model1, model2]
+            random.shuffle(current_models)  # Случайный выбор порядка игроков
+            game = SelfPlayGame(current_models)
+            game.trees = {color: MCTS(simulations, leaves_per_step) for color in ('white', 'black')}
+            active.append(game)
+            games_left -= 1
 
-    model1.fit(np.array(train_X1), np.array(train_y1), epochs=5, batch_size=32, validation_split=0.2)
-    model2.fit(np.array(train_X2), np.array(train_y2), epochs=5, batch_size=32, validation_split=0.2)
+        pending = {id(model1): (model1, []), id(model2): (model2, [])}
+        for game in active:
+            color = game.board.current_turn
+            with metrics.timer('mcts_select'):
+                leaves = game.trees[color].collect_leaves(game.board)
+            if leaves:
+                model = game.models[0 if color == 'white' else 1]
+                pending[id(model)][1].append((game.trees[color], leaves))
 
-    # Сохранение лучшей модели
-    score1 = model1.evaluate(np.array(train_X1), np.array(train_y1), verbose=0)
-    score2 = model2.evaluate(np.array(train_X2), np.array(train_y2), verbose=0)
-    winner_model = model1 if score1[1] > score2[1] else model2
+        for model, items in pending.values():
+            if not items:
+                continue
+            leaves = [leaf for _, tree_leaves in items for leaf in tree_leaves]
+            with metrics.timer('inference'):
+                batch_probs = predict_batch(model, np.stack([leaf.state for leaf in leaves]),
+                                            np.stack([leaf.mask for leaf in leaves]))
+            metrics.count('inference_positions', len(leaves))
+            offset = 0
+            for tree, tree_leaves in items:
+                tree.expand(tree_leaves, batch_probs[offset:offset + len(tree_leaves)])
+                offset += len(tree_leaves)
 
+        still_active = []
+        for game in active:
+            board = game.board
+            tree = game.trees[board.current_turn]
+            if not tree.search_done():
+                still_active.append(game)
+                continue
+            root_moves = list(tree.root.children)
+            move = tree.choose_move(temperature_for_ply(len(board.move_stack)))
+            packed_mask = pack_masks(legal_move_masks([root_moves]))[0]
+            game.move_history.append((get_board_state(board), packed_mask, encode_move(move), board.current_turn))
+            board.push(move)
+            for other in game.trees.values():
+                other.advance(move)
+            with metrics.timer('check'):
+                result = board.outcome(max_plies=max_plies)
+            if result is None:
+                still_active.append(game)
+            else:
+                total_simulations += sum(t.total_simulations for t in game.trees.values())
+                finish_game(game, result, train_data1, train_data2)
+        active = still_active
+
+    elapsed = time.perf_counter() - start_time
+    if elapsed > 0:
+        print(f"Пара {pair_index}: {num_games} партий MCTS за {elapsed:.1f} с ({num_games * 3600 / elapsed:.0f} партий/ч), "
+              f"{total_simulations / elapsed:.0f} симуляций/с")
+    return train_data1, train_data2
+
+
+# Обработка результата законченной партии; result — итог Board.outcome
+def finish_game(game, result, train_data1, train_data2):
+    winner, reason = result
+    metrics.count('games')
+    metrics.count('positions', len(game.move_history))
+    metrics.count(f'end_{reason}')
+    if winner is not None:
+        states, masks, labels, outcomes = train_data1 if winner == 'white' else train_data2
+        for state, packed_mask, move_index, color in game.move_history:
+            states.append(state)
+            masks.append(packed_mask)
+            labels.append(move_index)
+            outcomes.append(1 if color == winner else -1)
+    # При ничьей (по правилам или по пределу длины) никто не получает очков
+
+# Сохранение весов через временный файл и переименование, чтобы процесс
+# пула не прочитал наполовину записанный файл
+def save_weights(model, model_path):
+    tmp_path = model_path[:-len('.keras')] + '.tmp.keras'
+    model.save(tmp_path)
+    os.replace(tmp_path, model_path)
+
+# Обучение одной пары моделей. Партии самообучения играются процессами пула,
+# которые получают текущие веса через временные файлы: после каждого шага
+# обучения веса сохраняются, и следующие задачи пула играют уже ими. Данные
+# каждой модели копятся в своём буфере на диске в replay_dir и переживают перезапуск.
+# Победитель пары — модель, выигравшая матч из match_openings пар партий.
+def train_pair(pair_index, pool, num_games=10, replay_dir='replay', batch_size=32, match_openings=8):
+    models = [build_model(), build_model()]
+    buffers = [ReplayBuffer(os.path.join(replay_dir, f"pair_{pair_index}", f"model{i}")) for i in (1, 2)]
+    with tempfile.TemporaryDirectory() as weights_dir:
+        model_paths = [os.path.join(weights_dir, f"model{i}.keras") for i in (1, 2)]
+        for model, model_path in zip(models, model_paths):
+            save_weights(model, model_path)
+        # Пока процессы пула доигрывают партии, модели обучаются на уже полученных
+        for results in pool.play(pair_index, model_paths, num_games):
+            for model, model_path, buffer, train_data in zip(models, model_paths, buffers, results):
+                buffer.append(*train_data)
+                if len(buffer):
+                    with metrics.timer('train_step'):
+                        model.fit(buffer.dataset(batch_size), epochs=1, verbose=0)
+                    metrics.count('train_positions', len(buffer))
+                    save_weights(model, model_path)
+            metrics.maybe_dump()
+
+    for model, buffer in zip(models, buffers):
+        if not len(buffer):
+            continue
+        with metrics.timer('train_step'):
+            model.fit(buffer.dataset(batch_size), epochs=5)
+        metrics.count('train_positions', 5 * len(buffer))
+
+    # Победитель пары определяется матчем моделей между собой
+    scores = play_games(models[0], models[1], paired_openings(random.Random(pair_index), match_openings, 6))
+    score = sum(scores) / len(scores)
+    print(f"Пара {pair_index}: модель 1 набрала {score:.0%} очков против модели 2")
+    winner_model = models[0] if score > 0.5 else models[1]
+
+    os.makedirs("models", exist_ok=True)
     model_path = os.path.join("models", f"model_pair_{pair_index}_winner.keras")
     winner_model.save(model_path)
     print(f"Сохранена лучшая модель пары {pair_index} в {model_path}")
 
-# Обучение моделей с использованием нескольких ядер
-def train_multiple_pairs(num_pairs):
-    num_cores = cpu_count() // 2  # Используем половину доступных ядер
-    if num_pairs>num_cores:
-        print('Пар нейросетей больше чем ядер, их количество будет уменьшено')
-        while num_pairs>num_cores:
-            num_pairs=-1        
-    with Pool(processes=num_cores) as pool:
-        pool.map(train_pair, range(num_pairs))
-
-# Определение наилучшей модели среди всех сохраненных
-def find_best_model(models_dir='models'):
-    model_files = [os.path.join(models_dir, f) for f in os.listdir(models_dir) if f.endswith('.keras')]
-    best_model = None
+# Обучение моделей с использованием нескольких ядер: пары обучаются по очереди,
+# а партии самообучения каждой пары распределяются по всем процессам пула.
+# threads_per_worker ограничивает потоки TF/NumPy в каждом процессе, чтобы
+# num_workers * threads_per_worker не превышало число ядер.
+def train_multiple_pairs(num_pairs, num_games=10, num_workers=None, threads_per_worker=1, mcts_simulations=0,
+                         max_plies=MAX_GAME_PLIES):
+    if num_workers is None:
+        num_workers = max(1, cpu_count() // threads_per_worker)
+    with SelfPlayPool(num_workers, threads_per_worker, mcts_simulations=mcts_simulations,
+                      max_plies=max_plies) as pool:
+        with metrics.profiled('train'):
+            for pair_index in range(num_pairs):
+                train_pair(pair_index, pool, num_games=num_games)
+    metrics.maybe_dump(force=True)
+
+# Определение наилучшей модели среди всех сохраненных. Все модели оцениваются
+# на одном постоянном наборе позиций (см. evalset.py), поэтому результаты
+# сравнимы между моделями и запусками.
+def find_best_model(models_dir='models', eval_path=DEFAULT_EVAL_PATH):
+    model_files = sorted(os.path.join(models_dir, f) for f in os.listdir(models_dir) if f.endswith('.keras'))
+    best_file, best_model = None, None
     best_accuracy = 0
 
-    for model_file in model_files:
-        model = tf.keras.models.load_model(model_file)
-        test_X, test_y = generate_test_data()
-        score = model.evaluate(test_X, test_y, verbose=0)
-        print(f'Model {model_file}: Accuracy - {score[1]}')
-        if score[1] > best_accuracy:
-            best_accuracy = score[1]
-            best_model = model
-
-    return best_model
-
-# Генерация фиктивного тестового набора данных
-def generate_test_data(num_samples=100):
-    test_X = []
-    test_y = []
-    for _ in range(num_samples):
-        board = Board()
-        board.randomize()  # Допустим, у вас есть метод randomize, который случайным образом расставляет фигуры на доске
-        state = get_board_state(board)
-        possible_moves = board.get_all_possible_moves()
-        move = random.choice(possible_moves)
-        test_X.append(state)
-        test_y.append(move)
-    return np.array(test_X), np.array(test_y)
+    for model_file, (model, accuracy) in evaluate_models(model_files, eval_path).items():
+        print(f'Model {model_file}: Accuracy - {accuracy}')
+        if accuracy > best_accuracy:
+            best_accuracy = accuracy
+            best_file, best_model = model_file, model
+
+    return best_file, best_model
 
 if __name__ == "__main__":
     train_multiple_pairs(num_pairs=3)
-    best_model = find_best_model()
+    best_file, best_model = find_best_model()
+    best_path = "best_models/best_model.keras"
     os.makedirs('best_models', exist_ok=True)
-    if best_model:
-        best_model.save("best_models/best_model.keras")
-        print("Лучшая модель сохранена в best_models/best_model.keras")
-    else:
+    if not best_model:
         print("Не удалось определить лучшую модель")
+    else:
+        accepted = True
+        # Текущая лучшая модель заменяется, только если кандидат сильнее её в матче
+        if os.path.exists(best_path):
+            with Tournament() as tournament:
+                accepted, result = tournament.gate(best_file, best_path)
+            print(f"{best_file} против {best_path}: +{result['wins']} ={result['draws']} -{result['losses']}, "
+                  f"Elo {result['elo']:.0f} [{result['elo_low']:.0f}, {result['elo_high']:.0f}]")
+        if accepted:
+            best_model.save(best_path)
+            print(f"Лучшая модель сохранена в {best_path}")
+        else:
+            print("Кандидат не сильнее текущей лучшей модели, она остаётся прежней")
@@ -1,10 +1,19 @@
+from engine import SearchEngine
+
+
 class Bot:
-    def __init__(self, color):
+    # Бюджет задаётся временем на ход в секундах и/или числом узлов
+    def __init__(self, color, time_limit=1.0, node_limit=None, max_depth=64):
         self.color = color
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.engine = SearchEngine()
 
     def get_best_move(self, board):
-        # Реализация алгоритма Minimax
-        pass
+        # Альфа-бета с итеративным углублением; статистика последнего поиска — в self.engine.stats()
+        return self.engine.search(board, max_depth=self.max_depth,
+                                  time_limit=self.time_limit, node_limit=self.node_limit)
 
 class ChessGUI:
     def __init__(self, root):
@@ -1,29 +1,51 @@
-import chess
-import chess.pgn
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
+import os
+import logging
+from backend import tf, PolicyBackend
 
 class ChessAI:
-    def __init__(self):
-        self.model = self.create_model()
+    def __init__(self, model_path='best_models/best_model.keras'):
+        # TensorFlow и модели загружаются только при первом обращении
+        self.model_path = model_path
+        self._model = None
+        # Модель для подсказок загружается один раз; каждый следующий ход — один прямой проход
+        self.policy = PolicyBackend(model_path)
 
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self.create_model()
+        return self._model
+
+    # Сохранённая модель, если она есть, иначе новая той же архитектуры,
+    # что и в самообучении (neuro.build_model), чтобы подсказки её понимали
     def create_model(self):
-        model = keras.Sequential([
-            layers.Dense(256, activation='relu', input_shape=(8*8,)),
-            layers.Dense(256, activation='relu'),
-            layers.Dense(64, activation='softmax')
-        ])
-        model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
-        return model
-
-    def train(self, games):
-        # Тренировка модели на наборах данных
-        pass
+        if os.path.exists(self.model_path):
+            return tf.keras.models.load_model(self.model_path)
+        from neuro import build_model
+        return build_model()
+
+    # Обучение на партиях: games — файл или список файлов PGN, которые
+    # сначала загружаются в набор на диске dataset_path, либо уже готовый
+    # набор (replay.ReplayBuffer). Обученная модель сохраняется в model_path
+    # и сразу используется для подсказок.
+    def train(self, games, dataset_path='pgn_dataset', epochs=1, batch_size=256, num_workers=None):
+        from replay import ReplayBuffer
+        if isinstance(games, ReplayBuffer):
+            dataset = games
+        else:
+            from pgn import ingest_pgn
+            dataset = ingest_pgn(games, dataset_path, num_workers=num_workers)
+        if not len(dataset):
+            return None
+        history = self.model.fit(dataset.dataset(batch_size), epochs=epochs)
+        os.makedirs(os.path.dirname(self.model_path) or '.', exist_ok=True)
+        self.model.save(self.model_path)
+        self.policy = PolicyBackend(self.model_path)
+        return history
 
     def predict(self, board):
         # Предсказание лучшего хода
-        pass
+        return self.policy.recommend(board)
 class ChessGUI:
     def __init__(self, root):
         # ... ваш предыдущий код ...
@@ -46,4 +68,9 @@ class ChessGUI:
 
     def ai_recommendation(self):
         # Получение рекомендаций от нейросети
-        pass
+        move = self.ai.predict(self.board)
+        stats = self.ai.policy.stats()
+        if stats:
+            logging.debug(f"Подсказка {move}: холодный старт {stats['cold_start_ms']:.0f} мс, "
+                          f"ход {stats['mean_ms']:.1f} мс в среднем")
+        return move
@@ -0,0 +1,87 @@
+import sys
+import time
+from logic import Board
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# Набор позиций для проверки генератора ходов: (название, FEN, {глубина: число узлов}).
+# Эталонные значения — общепринятые результаты perft для полных правил шахмат.
+BENCHMARK_POSITIONS = [
+    ('start', START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ('endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ('promotions', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ('middlegame', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ('quiet', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+]
+
+
+# Число листьев дерева допустимых ходов заданной глубины
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    moves = list(board.legal_moves())
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+# perft с разбивкой по ходам из корня — для поиска расхождений с эталоном
+def divide(board, depth):
+    counts = {}
+    for move in list(board.legal_moves()):
+        board.push(move)
+        counts[move] = perft(board, depth - 1) if depth > 1 else 1
+        board.pop()
+    return counts
+
+
+def run_benchmark(max_depth=3, positions=BENCHMARK_POSITIONS):
+    results = []
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, reference in positions:
+        board = Board.from_fen(fen)
+        for depth in sorted(reference):
+            if depth > max_depth:
+                break
+            start = time.perf_counter()
+            nodes = perft(board, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            ok = nodes == reference[depth]
+            nps = int(nodes / elapsed) if elapsed > 0 else 0
+            results.append({'position': name, 'depth': depth, 'nodes': nodes,
+                            'expected': reference[depth], 'ok': ok, 'time': elapsed, 'nps': nps})
+            status = 'OK' if ok else f'ОШИБКА (ожидалось {reference[depth]})'
+            print(f'{name:<12} глубина {depth}: {nodes:>10} узлов, {elapsed:8.3f} с, {nps:>8} узл/с  {status}')
+    nps = int(total_nodes / total_time) if total_time > 0 else 0
+    print(f'Итого: {total_nodes} узлов за {total_time:.3f} с, {nps} узл/с')
+    return results
+
+
+if __name__ == "__main__":
+    # python perft.py [глубина] — прогон набора позиций
+    # python perft.py divide <глубина> "<FEN>" — разбивка по ходам для одной позиции
+    if len(sys.argv) > 1 and sys.argv[1] == 'divide':
+        depth = int(sys.argv[2])
+        board = Board.from_fen(sys.argv[3] if len(sys.argv) > 3 else START_FEN)
+        counts = divide(board, depth)
+        for move, nodes in sorted(counts.items()):
+            print(f'{move}: {nodes}')
+        print(f'Итого: {sum(counts.values())}')
+    else:
+        results = run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
+        sys.exit(0 if all(r['ok'] for r in results) else 1)
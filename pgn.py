@@ -0,0 +1,251 @@
+import re
+import collections
+import multiprocessing
+import numpy as np
+from logic import Board, Pawn, Knight, Bishop, Rook, Queen, King, square_name
+from encoding import encode_board
+from policy import encode_move, legal_move_masks, pack_masks
+from replay import ReplayBuffer
+
+# Чтение партий в формате PGN и превращение их в обучающие позиции.
+# Файл читается построчно, партия за партией, поэтому его размер не
+# ограничен памятью. Ходы в записи SAN сопоставляются с допустимыми ходами
+# logic.Board; партия обрывается на первом ходе, которого среди них нет.
+
+SAN_PIECES = {'N': Knight, 'B': Bishop, 'R': Rook, 'Q': Queen, 'K': King}
+SAN_LETTERS = {piece_type: letter for letter, piece_type in SAN_PIECES.items()}
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+TAG_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+TOKEN_PATTERN = re.compile(r'\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|[^\s(){};]+')
+RESULTS = {'1-0': 'white', '0-1': 'black', '1/2-1/2': None}
+
+
+def parse_square(name):
+    return 8 - int(name[1]), 'abcdefgh'.index(name[0])
+
+
+# Поток текстов партий (заголовки и ходы) из открытого файла PGN
+def iter_game_texts(lines):
+    game = []
+    in_moves = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('[') and in_moves:
+            yield ''.join(game)
+            game = []
+            in_moves = False
+        if stripped and not stripped.startswith('['):
+            in_moves = True
+        game.append(line)
+    if in_moves:
+        yield ''.join(game)
+
+
+# Заголовки и список ходов SAN одной партии; комментарии, варианты и NAG пропускаются
+def parse_game(text):
+    headers = {}
+    movetext = []
+    for line in text.splitlines(True):
+        match = TAG_PATTERN.match(line.strip())
+        if match:
+            headers[match.group(1)] = match.group(2)
+        else:
+            movetext.append(line)
+    sans = []
+    depth = 0
+    for token in TOKEN_PATTERN.findall(''.join(movetext)):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth or token[0] in '{;$' or token in RESULTS or token == '*':
+            continue
+        else:
+            token = re.sub(r'^\d+\.+', '', token)
+            if token:
+                sans.append(token)
+    return headers, sans
+
+
+# Допустимый ход позиции, записанный в SAN
+def parse_san(board, san, legal_moves=None):
+    legal_moves = list(board.legal_moves()) if legal_moves is None else legal_moves
+    san = san.rstrip('+#!?')
+    if san in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        direction = 1 if len(san) == 3 else -1
+        candidates = [m for m in legal_moves if type(board.board[m[0][0]][m[0][1]]) is King
+                      and m[1][1] - m[0][1] == 2 * direction]
+    else:
+        match = SAN_PATTERN.match(san)
+        if match is None:
+            raise ValueError(f"Invalid SAN: {san}")
+        letter, from_file, from_rank, target, promotion = match.groups()
+        piece_type = SAN_PIECES[letter] if letter else Pawn
+        target = parse_square(target)
+        promotion = SAN_PIECES[promotion] if promotion else None
+        candidates = []
+        for move in legal_moves:
+            (x1, y1), end = move[0], move[1]
+            if end != target or type(board.board[x1][y1]) is not piece_type:
+                continue
+            if from_file and y1 != 'abcdefgh'.index(from_file):
+                continue
+            if from_rank and x1 != 8 - int(from_rank):
+                continue
+            if (move[2] if len(move) > 2 else None) is not promotion:
+                continue
+            candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f"Illegal or ambiguous move: {san}")
+    return candidates[0]
+
+
+# Запись хода в SAN; board — позиция до хода
+def move_to_san(board, move, legal_moves=None):
+    legal_moves = list(board.legal_moves()) if legal_moves is None else legal_moves
+    (x1, y1), (x2, y2) = move[0], move[1]
+    piece = board.board[x1][y1]
+    capture = board.board[x2][y2] is not None
+    if type(piece) is King and abs(y2 - y1) == 2:
+        san = 'O-O' if y2 > y1 else 'O-O-O'
+    elif type(piece) is Pawn:
+        capture = capture or y1 != y2
+        san = ('abcdefgh'[y1] + 'x' if capture else '') + square_name(x2, y2)
+        if len(move) > 2:
+            san += '=' + SAN_LETTERS[move[2]]
+    else:
+        san = SAN_LETTERS[type(piece)]
+        rivals = [m[0] for m in legal_moves if m[1] == move[1] and m[0] != move[0]
+                  and type(board.board[m[0][0]][m[0][1]]) is type(piece)]
+        if rivals:
+            if all(start[1] != y1 for start in rivals):
+                san += 'abcdefgh'[y1]
+            elif all(start[0] != x1 for start in rivals):
+                san += str(8 - x1)
+            else:
+                san += square_name(x1, y1)
+        san += ('x' if capture else '') + square_name(x2, y2)
+    board.push(move)
+    if board.is_check():
+        san += '#' if board.is_checkmate() else '+'
+    board.pop()
+    return san
+
+
+# Текст PGN партии, сыгранной на board (ходы берутся из стека отмены)
+def game_to_pgn(board, headers=None, result='*'):
+    moves = []
+    while board.move_stack:
+        moves.append(board.pop())
+    moves.reverse()
+    start_fen = board.to_fen()
+    headers = dict(headers or {})
+    headers.setdefault('Result', result)
+    if start_fen != Board().to_fen():
+        headers['SetUp'] = '1'
+        headers['FEN'] = start_fen
+    started_black = board.current_turn == 'black'
+    tokens = []
+    for move in moves:
+        if board.current_turn == 'white':
+            tokens.append(f"{board.start_fullmove + (len(board.move_stack) + started_black) // 2}.")
+        elif not tokens:
+            tokens.append(f"{board.start_fullmove}...")
+        tokens.append(move_to_san(board, move))
+        board.push(move)
+    tokens.append(headers['Result'])
+    tag_lines = ''.join(f'[{name} "{value}"]\n' for name, value in headers.items())
+    return f"{tag_lines}\n{' '.join(tokens)}\n"
+
+
+# Обучающие позиции одной партии: (состояния, упакованные маски, индексы
+# ходов, результаты для ходившей стороны). Партии без результата не
+# используются; непонятный ход обрывает партию, а партия с непонятной
+# начальной позицией (например, Chess960) пропускается целиком.
+def game_positions(text):
+    try:
+        headers, sans = parse_game(text)
+        result = headers.get('Result')
+        if result not in RESULTS:
+            return None
+        board = Board.from_fen(headers['FEN']) if 'FEN' in headers else Board()
+    except ValueError:
+        return None
+    winner = RESULTS[result]
+    states, moves, outcomes, move_lists = [], [], [], []
+    for san in sans:
+        legal = list(board.legal_moves())
+        try:
+            move = parse_san(board, san, legal)
+        except ValueError:
+            break
+        states.append(encode_board(board, dtype=np.uint8))
+        move_lists.append(legal)
+        moves.append(encode_move(move))
+        outcomes.append(0 if winner is None else (1 if board.current_turn == winner else -1))
+        board.push(move)
+    if not moves:
+        return None
+    return (np.array(states, dtype=np.uint8), pack_masks(legal_move_masks(move_lists, dtype=np.uint8)),
+            np.array(moves, dtype=np.int32), np.array(outcomes, dtype=np.int8))
+
+
+# Задача процесса: пачка текстов партий -> общие массивы позиций
+def _encode_chunk(texts):
+    parts = [positions for positions in map(game_positions, texts) if positions is not None]
+    if not parts:
+        return None, len(texts)
+    return tuple(np.concatenate(field) for field in zip(*parts)), len(texts)
+
+
+def _chunks(paths, games_per_chunk):
+    chunk = []
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for text in iter_game_texts(f):
+                chunk.append(text)
+                if len(chunk) == games_per_chunk:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+# Загрузка файлов PGN в буфер на диске (формат replay.ReplayBuffer), который
+# обучение читает напрямую. Главный процесс читает файлы и раздаёт пачки
+# партий процессам пула; в работе одновременно не больше max_pending пачек,
+# поэтому память ограничена независимо от размера файлов.
+def ingest_pgn(paths, out_path, capacity=2000000, num_workers=None, games_per_chunk=256, max_pending=None):
+    if isinstance(paths, str):
+        paths = [paths]
+    num_workers = num_workers or multiprocessing.cpu_count()
+    max_pending = max_pending or 2 * num_workers
+    buffer = ReplayBuffer(out_path, capacity)
+    games = 0
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(num_workers) as pool:
+        pending = collections.deque()
+
+        def collect():
+            nonlocal games
+            arrays, count = pending.popleft().get()
+            games += count
+            if arrays is not None:
+                buffer.append(*arrays)
+
+        for chunk in _chunks(paths, games_per_chunk):
+            pending.append(pool.apply_async(_encode_chunk, (chunk,)))
+            if len(pending) >= max_pending:
+                collect()
+        while pending:
+            collect()
+    print(f"Загружено партий: {games}, позиций в наборе: {len(buffer)}")
+    return buffer
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 3:
+        print("Использование: python pgn.py <выходной каталог> <файл.pgn> [...]")
+    else:
+        ingest_pgn(sys.argv[2:], sys.argv[1])
@@ -0,0 +1,97 @@
+import numpy as np
+from logic import Knight, Bishop, Rook, Queen
+
+# Фиксированная нумерация ходов для выхода политики:
+#   from_sq * 64 + to_sq                    — обычный ход и превращение в ферзя;
+#   4096 + ((side * 8 + from_col) * 3 + direction) * 3 + kind
+#                                           — слабое превращение в коня, слона или ладью.
+# Клетка sq = row * 8 + col, как в logic.Board. side = 0 для хода с 1-й строки
+# на 0-ю (белые), 1 — с 6-й на 7-ю (чёрные); direction = to_col - from_col + 1.
+# Превращение задаётся третьим элементом хода: ((r, c), (r, c), Knight).
+UNDERPROMOTIONS = [Knight, Bishop, Rook]
+UNDERPROMOTION_OFFSET = 64 * 64
+POLICY_SIZE = UNDERPROMOTION_OFFSET + 2 * 8 * 3 * len(UNDERPROMOTIONS)
+MASK_BYTES = (POLICY_SIZE + 7) // 8
+
+
+def encode_move(move):
+    (x1, y1), (x2, y2) = move[0], move[1]
+    promotion = move[2] if len(move) > 2 else None
+    if promotion is None or promotion is Queen:
+        return (x1 * 8 + y1) * 64 + x2 * 8 + y2
+    side = 0 if x1 == 1 else 1
+    return UNDERPROMOTION_OFFSET + ((side * 8 + y1) * 3 + (y2 - y1 + 1)) * 3 + UNDERPROMOTIONS.index(promotion)
+
+
+def encode_moves(moves):
+    return np.fromiter((encode_move(move) for move in moves), dtype=np.int32, count=len(moves))
+
+
+# Таблицы для векторного декодирования: индекс -> клетка откуда, клетка куда,
+# номер слабого превращения (-1 — нет)
+def _build_decode_tables():
+    from_sq = np.empty(POLICY_SIZE, dtype=np.int8)
+    to_sq = np.empty(POLICY_SIZE, dtype=np.int8)
+    promotion = np.full(POLICY_SIZE, -1, dtype=np.int8)
+    plain = np.arange(UNDERPROMOTION_OFFSET)
+    from_sq[:UNDERPROMOTION_OFFSET] = plain // 64
+    to_sq[:UNDERPROMOTION_OFFSET] = plain % 64
+    for idx in range(UNDERPROMOTION_OFFSET, POLICY_SIZE):
+        rest, kind = divmod(idx - UNDERPROMOTION_OFFSET, 3)
+        rest, direction = divmod(rest, 3)
+        side, from_col = divmod(rest, 8)
+        from_row, to_row = (1, 0) if side == 0 else (6, 7)
+        from_sq[idx] = from_row * 8 + from_col
+        to_sq[idx] = to_row * 8 + from_col + direction - 1
+        promotion[idx] = kind
+    return from_sq, to_sq, promotion
+
+
+INDEX_FROM, INDEX_TO, INDEX_PROMOTION = _build_decode_tables()
+
+
+def decode_indices(indices):
+    indices = np.asarray(indices)
+    return INDEX_FROM[indices], INDEX_TO[indices], INDEX_PROMOTION[indices]
+
+
+# Превращение в ферзя не отличается по индексу от обычного хода: если нужна
+# точная форма хода, его надо сопоставить со списком допустимых ходов
+def decode_move(index):
+    from_sq, to_sq, promotion = int(INDEX_FROM[index]), int(INDEX_TO[index]), int(INDEX_PROMOTION[index])
+    move = (divmod(from_sq, 8), divmod(to_sq, 8))
+    if promotion >= 0:
+        move += (UNDERPROMOTIONS[promotion],)
+    return move
+
+
+# Маски допустимых ходов (N, POLICY_SIZE) для пачки списков ходов
+def legal_move_masks(move_lists, out=None, dtype=np.float32):
+    if out is None:
+        out = np.zeros((len(move_lists), POLICY_SIZE), dtype=dtype)
+    else:
+        out[:len(move_lists)].fill(0)
+    rows = np.repeat(np.arange(len(move_lists)), [len(moves) for moves in move_lists])
+    cols = np.concatenate([encode_moves(moves) for moves in move_lists]) if move_lists else []
+    out[rows, cols] = 1
+    return out
+
+
+def board_masks(boards, out=None, dtype=np.float32):
+    return legal_move_masks([list(board.legal_moves()) for board in boards], out=out, dtype=dtype)
+
+
+# Компактное хранение масок: 530 байт на позицию вместо POLICY_SIZE
+def pack_masks(masks):
+    return np.packbits(np.asarray(masks, dtype=bool), axis=-1)
+
+
+def unpack_masks(packed, dtype=np.float32):
+    return np.unpackbits(np.asarray(packed, dtype=np.uint8), axis=-1, count=POLICY_SIZE).astype(dtype)
+
+
+def masked_softmax(logits, masks):
+    logits = np.where(masks > 0, logits, -np.inf)
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=-1, keepdims=True)
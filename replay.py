@@ -0,0 +1,91 @@
+import os
+import json
+import numpy as np
+from encoding import STATE_SHAPE
+from policy import POLICY_SIZE, MASK_BYTES, unpack_masks
+
+# Буфер позиций самообучения на диске. Каждое поле хранится в отдельном
+# файле .npy, отображённом в память, поэтому объём данных ограничен
+# диском, а не оперативной памятью. Буфер кольцевой: после заполнения
+# новые позиции вытесняют самые старые.
+FIELDS = {
+    'states': (np.uint8, STATE_SHAPE),
+    'masks': (np.uint8, (MASK_BYTES,)),
+    'moves': (np.int32, ()),
+    'outcomes': (np.int8, ()),
+}
+
+
+class ReplayBuffer:
+    def __init__(self, path, capacity=200000):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.capacity = meta['capacity']
+            self.position = meta['position']
+            self.size = meta['size']
+            mode = 'r+'
+        else:
+            self.capacity = capacity
+            self.position = 0
+            self.size = 0
+            mode = 'w+'
+        self.arrays = {}
+        for name, (dtype, shape) in FIELDS.items():
+            file_path = os.path.join(path, f'{name}.npy')
+            if mode == 'w+':
+                self.arrays[name] = np.lib.format.open_memmap(file_path, mode='w+', dtype=dtype,
+                                                              shape=(self.capacity,) + shape)
+            else:
+                self.arrays[name] = np.load(file_path, mmap_mode='r+')
+
+    def __len__(self):
+        return self.size
+
+    # Добавление пачки позиций; outcome — результат партии для стороны,
+    # которая ходила в этой позиции (1, 0 или -1)
+    def append(self, states, masks, moves, outcomes):
+        count = len(moves)
+        if count == 0:
+            return
+        values = {'states': states, 'masks': masks, 'moves': moves, 'outcomes': outcomes}
+        # Если пачка больше буфера, в нём остаются только последние capacity позиций
+        start = max(0, count - self.capacity)
+        indices = (self.position + np.arange(count - start)) % self.capacity
+        for name, array in self.arrays.items():
+            array[indices] = np.asarray(values[name])[start:]
+        self.position = int((self.position + count - start) % self.capacity)
+        self.size = min(self.capacity, self.size + count - start)
+        self.flush()
+
+    def flush(self):
+        for array in self.arrays.values():
+            array.flush()
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump({'capacity': self.capacity, 'position': self.position, 'size': self.size}, f)
+
+    # Пачки ([состояния, маски], индексы ходов) для model.fit. Читаются
+    # только нужные строки отображённых файлов.
+    def batches(self, batch_size=32, shuffle=True):
+        size = self.size
+        order = np.random.permutation(size) if shuffle else np.arange(size)
+        for start in range(0, size, batch_size):
+            indices = np.sort(order[start:start + batch_size])
+            states = self.arrays['states'][indices].astype(np.float32)
+            masks = unpack_masks(self.arrays['masks'][indices])
+            yield (states, masks), self.arrays['moves'][indices]
+
+    # Конвейер tf.data поверх batches() с подкачкой следующих пачек,
+    # пока модель обучается на текущей
+    def dataset(self, batch_size=32, shuffle=True):
+        import tensorflow as tf
+        signature = (
+            (tf.TensorSpec((None,) + STATE_SHAPE, tf.float32), tf.TensorSpec((None, POLICY_SIZE), tf.float32)),
+            tf.TensorSpec((None,), tf.int32),
+        )
+        dataset = tf.data.Dataset.from_generator(lambda: self.batches(batch_size, shuffle),
+                                                 output_signature=signature)
+        return dataset.prefetch(tf.data.AUTOTUNE)
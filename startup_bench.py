@@ -0,0 +1,40 @@
+import sys
+import subprocess
+
+# Замер времени импорта модулей в отдельном чистом процессе. Заодно
+# проверяется, что при импорте не загружается tensorflow: нейросетевые
+# части должны подгружаться лениво, при первом использовании (см. backend.py).
+MODULES = ['logic', 'bitboard', 'engine', 'perft', 'interface', 'p2e', 'p2neu', 'neuro', 'mcts',
+           'inference', 'tournament', 'pgn']
+BUDGET_SECONDS = 1.0
+
+_PROBE = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - start, 'tensorflow' in sys.modules)\n"
+)
+
+
+def measure(module):
+    output = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)],
+                            capture_output=True, text=True, check=True).stdout.split()
+    return float(output[-2]), output[-1] == 'True'
+
+
+def run_benchmark(modules=MODULES, budget=BUDGET_SECONDS):
+    ok = True
+    for module in modules:
+        elapsed, tf_loaded = measure(module)
+        problems = []
+        if elapsed > budget:
+            problems.append(f'дольше {budget} с')
+        if tf_loaded:
+            problems.append('загружен tensorflow')
+        ok = ok and not problems
+        print(f"{module:<10} {elapsed * 1000:8.1f} мс  {'; '.join(problems) if problems else 'OK'}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_benchmark() else 1)
@@ -0,0 +1,237 @@
+import os
+import math
+import random
+import itertools
+import numpy as np
+from logic import Board
+from encoding import encode_boards
+from policy import encode_moves, legal_move_masks
+from workers import spawn_pool, load_model_cached
+
+# Турнир сохранённых моделей: партии играются процессами пула, внутри
+# процесса партии идут синхронно с пакетным инференсом. Чтобы партии жадных
+# моделей не повторялись, каждая начинается с короткого случайного дебюта,
+# и каждый дебют играется дважды со сменой цвета.
+
+MODEL_DIRS = ['models', 'best_models']
+
+
+def find_model_files(dirs=MODEL_DIRS):
+    files = []
+    for models_dir in dirs:
+        if os.path.isdir(models_dir):
+            files.extend(sorted(os.path.join(models_dir, f) for f in os.listdir(models_dir) if f.endswith('.keras')))
+    return files
+
+
+def random_opening(rng, plies):
+    board = Board()
+    moves = []
+    for _ in range(plies):
+        legal = list(board.legal_moves())
+        if not legal:
+            break
+        move = rng.choice(legal)
+        board.push(move)
+        moves.append(move)
+    return moves
+
+
+# Партии model_a против model_b; openings — список (ходы дебюта, играет ли A белыми).
+# Возвращает очки A в каждой партии: 1, 0.5 или 0. Ничьи по правилам и партии
+# длиннее max_plies полуходов считаются ничьей.
+def play_games(model_a, model_b, openings, max_plies=200):
+    from neuro import predict_batch
+    games = []
+    for opening, a_is_white in openings:
+        board = Board()
+        for move in opening:
+            board.push(move)
+        players = {'white': model_a if a_is_white else model_b, 'black': model_b if a_is_white else model_a}
+        games.append({'board': board, 'players': players, 'a_color': 'white' if a_is_white else 'black'})
+
+    scores = [None] * len(games)
+    active = list(range(len(games)))
+    while active:
+        pending = {id(model_a): (model_a, []), id(model_b): (model_b, [])}
+        still_active = []
+        for i in active:
+            game = games[i]
+            board = game['board']
+            moves = list(board.legal_moves())
+            result = board.outcome(bool(moves), max_plies)
+            if result is not None:
+                winner = result[0]
+                scores[i] = 0.5 if winner is None else (1.0 if winner == game['a_color'] else 0.0)
+                continue
+            pending[id(game['players'][board.current_turn])][1].append((game, moves))
+            still_active.append(i)
+        active = still_active
+
+        for model, items in pending.values():
+            if not items:
+                continue
+            states = encode_boards([game['board'] for game, _ in items])
+            masks = legal_move_masks([moves for _, moves in items])
+            batch_probs = predict_batch(model, states, masks)
+            for (game, moves), probs in zip(items, batch_probs):
+                game['board'].push(moves[int(np.argmax(probs[encode_moves(moves)]))])
+    return scores
+
+
+# Каждый случайный дебют играется дважды: A белыми и A чёрными
+def paired_openings(rng, num_openings, opening_plies):
+    openings = []
+    for _ in range(num_openings):
+        moves = random_opening(rng, opening_plies)
+        openings.append((moves, True))
+        openings.append((moves, False))
+    return openings
+
+
+def _match_task(task):
+    path_a, path_b, seed, num_openings, opening_plies, max_plies = task
+    openings = paired_openings(random.Random(seed), num_openings, opening_plies)
+    scores = play_games(load_model_cached(path_a), load_model_cached(path_b), openings, max_plies)
+    return scores.count(1.0), scores.count(0.5), scores.count(0.0)
+
+
+# Разница Elo по доле набранных очков
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+# Оценка Elo с 95% доверительным интервалом по триномиальной модели результатов
+def elo_interval(wins, draws, losses, z=1.96):
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, -math.inf, math.inf
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = z * math.sqrt(variance / games)
+    return elo_from_score(score), elo_from_score(score - margin), elo_from_score(score + margin)
+
+
+# Логарифм отношения правдоподобия SPRT для гипотез elo0 и elo1
+# (нормальное приближение триномиальной модели)
+def sprt_llr(wins, draws, losses, elo0=0.0, elo1=10.0):
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance <= 0:
+        return 0.0
+    s0, s1 = expected_score(elo0), expected_score(elo1)
+    return (s1 - s0) * (2 * (wins + 0.5 * draws) - games * (s0 + s1)) / (2 * variance)
+
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+class Tournament:
+    def __init__(self, num_workers=None, threads_per_worker=1, openings_per_task=8, opening_plies=6,
+                 max_plies=200, seed=0):
+        self.num_workers = num_workers or os.cpu_count()
+        self.pool = spawn_pool(self.num_workers, threads_per_worker)
+        self.openings_per_task = openings_per_task
+        self.opening_plies = opening_plies
+        self.max_plies = max_plies
+        self.seed = seed
+
+    # Матч из num_games партий (округляется до пар с обменом цветом). При
+    # sprt=(elo0, elo1) матч останавливается, как только SPRT принимает
+    # одну из гипотез. Возвращает словарь с результатом с точки зрения A.
+    def match(self, path_a, path_b, num_games=200, sprt=None, alpha=0.05, beta=0.05):
+        num_tasks = max(1, math.ceil(num_games / (2 * self.openings_per_task)))
+        tasks = [(path_a, path_b, self.seed + i, self.openings_per_task, self.opening_plies, self.max_plies)
+                 for i in range(num_tasks)]
+        wins = draws = losses = 0
+        decision = None
+        lower, upper = sprt_bounds(alpha, beta)
+        # Задачи отправляются волнами по числу процессов, чтобы после решения
+        # SPRT в пуле не оставалось недоигранных задач
+        for start in range(0, len(tasks), self.num_workers):
+            for w, d, l in self.pool.imap_unordered(_match_task, tasks[start:start + self.num_workers]):
+                wins += w
+                draws += d
+                losses += l
+            if sprt is not None:
+                llr = sprt_llr(wins, draws, losses, *sprt)
+                if llr >= upper:
+                    decision = 'H1'
+                elif llr <= lower:
+                    decision = 'H0'
+                if decision:
+                    break
+        elo, elo_low, elo_high = elo_interval(wins, draws, losses)
+        return {'wins': wins, 'draws': draws, 'losses': losses, 'elo': elo,
+                'elo_low': elo_low, 'elo_high': elo_high, 'sprt': decision}
+
+    # Принимается ли кандидат вместо текущей лучшей модели
+    def gate(self, candidate, incumbent, max_games=400, elo0=0.0, elo1=10.0):
+        result = self.match(candidate, incumbent, max_games, sprt=(elo0, elo1))
+        if result['sprt'] is None:
+            return result['elo_low'] > elo0, result
+        return result['sprt'] == 'H1', result
+
+    # Круговой турнир; рейтинги подбираются по всем результатам методом
+    # максимального правдоподобия (модель Брэдли-Терри), средний рейтинг — 0
+    def round_robin(self, model_files, games_per_pair=40):
+        results = {}
+        for a, b in itertools.combinations(model_files, 2):
+            results[(a, b)] = self.match(a, b, games_per_pair)
+            r = results[(a, b)]
+            print(f"{a} - {b}: +{r['wins']} ={r['draws']} -{r['losses']}, "
+                  f"Elo {r['elo']:.0f} [{r['elo_low']:.0f}, {r['elo_high']:.0f}]")
+        return fit_ratings(model_files, results), results
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pool.terminate()
+        return False
+
+
+def fit_ratings(model_files, results, iterations=500, learning_rate=20.0):
+    ratings = {f: 0.0 for f in model_files}
+    for _ in range(iterations):
+        gradient = {f: 0.0 for f in model_files}
+        for (a, b), r in results.items():
+            games = r['wins'] + r['draws'] + r['losses']
+            if not games:
+                continue
+            delta = (r['wins'] + 0.5 * r['draws']) - games * expected_score(ratings[a] - ratings[b])
+            gradient[a] += delta / games
+            gradient[b] -= delta / games
+        for f in model_files:
+            ratings[f] += learning_rate * gradient[f]
+        mean = sum(ratings.values()) / len(ratings)
+        for f in model_files:
+            ratings[f] -= mean
+    return ratings
+
+
+if __name__ == "__main__":
+    model_files = find_model_files()
+    if len(model_files) < 2:
+        print("Для турнира нужно хотя бы две модели в models/ или best_models/")
+    else:
+        with Tournament() as tournament:
+            ratings, _ = tournament.round_robin(model_files)
+        for model_file, rating in sorted(ratings.items(), key=lambda item: -item[1]):
+            print(f"{rating:8.1f}  {model_file}")
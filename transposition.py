@@ -0,0 +1,67 @@
+# Таблица транспозиций фиксированного размера, адресуемая ключом Zobrist (Board.zobrist_key)
+
+# Тип оценки, сохранённой в записи
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+# Приблизительный объём одной записи в памяти Python: кортеж из шести полей
+# вместе с 64-битным ключом. Используется только для пересчёта бюджета памяти
+# в количество корзин.
+ENTRY_SIZE = 160
+
+
+class TranspositionTable:
+    # Каждая корзина состоит из двух слотов: в первый попадает запись с
+    # наибольшей глубиной (или запись из более старого поиска), во второй —
+    # всё остальное, он перезаписывается всегда.
+    def __init__(self, size_mb=16):
+        buckets = max(1, size_mb * 1024 * 1024 // (2 * ENTRY_SIZE))
+        # Размер — степень двойки, чтобы индекс брался маской
+        self.num_buckets = 1 << (buckets.bit_length() - 1)
+        self.mask = self.num_buckets - 1
+        self.depth_slots = [None] * self.num_buckets
+        self.always_slots = [None] * self.num_buckets
+        self.age = 0
+        self.hits = 0
+        self.probes = 0
+
+    # Вызывается в начале каждого нового поиска: записи предыдущих поисков
+    # можно вытеснять из слота по глубине
+    def new_search(self):
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        self.depth_slots = [None] * self.num_buckets
+        self.always_slots = [None] * self.num_buckets
+        self.age = 0
+        self.hits = 0
+        self.probes = 0
+
+    # Запись: (ключ, глубина, оценка, тип оценки, лучший ход, возраст)
+    def store(self, key, depth, value, flag, move=None):
+        idx = key & self.mask
+        entry = (key, depth, value, flag, move, self.age)
+        current = self.depth_slots[idx]
+        if current is None or current[0] == key or depth >= current[1] or current[5] != self.age:
+            self.depth_slots[idx] = entry
+        else:
+            self.always_slots[idx] = entry
+
+    def probe(self, key):
+        self.probes += 1
+        idx = key & self.mask
+        entry = self.depth_slots[idx]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.always_slots[idx]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def __len__(self):
+        return sum(1 for e in self.depth_slots if e is not None) + \
+            sum(1 for e in self.always_slots if e is not None)
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
@@ -0,0 +1,124 @@
+import os
+import queue
+import multiprocessing
+import metrics
+
+# Пул процессов самообучения. Процессы запускаются методом spawn, поэтому
+# TensorFlow инициализируется в каждом процессе заново, а не наследуется
+# форком из родителя. Веса передаются через файлы .keras: процесс загружает
+# модель один раз и перечитывает её, только когда файл изменился.
+
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                   'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS']
+
+# Кэш моделей процесса: путь -> (время изменения файла, модель)
+_worker_models = {}
+
+
+# Ограничение числа потоков NumPy/TF в процессе, чтобы процессы пула не
+# делили ядра друг с другом. Должно вызываться до импорта tensorflow.
+def limit_threads(num_threads):
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(num_threads)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(num_threads)
+
+
+def _init_worker(threads_per_worker):
+    limit_threads(threads_per_worker)
+
+
+# Модель из файла весов с кэшем в процессе. Оценки позиций кэшируются в
+# neuro.evaluation_cache этого же процесса, поэтому при замене модели её
+# записи удаляются здесь: главный процесс до этого кэша не достаёт.
+def load_model_cached(path):
+    import tensorflow as tf
+    from neuro import evaluation_cache
+    # Временные каталоги весов удаляются после каждой пары: модели по
+    # исчезнувшим путям больше не понадобятся и не должны копиться в процессе
+    for stale in [p for p in _worker_models if p != path and not os.path.exists(p)]:
+        evaluation_cache.invalidate(_worker_models.pop(stale)[1])
+    mtime = os.path.getmtime(path)
+    cached = _worker_models.get(path)
+    if cached is None or cached[0] != mtime:
+        if cached is not None:
+            evaluation_cache.invalidate(cached[1])
+        cached = (mtime, tf.keras.models.load_model(path))
+        _worker_models[path] = cached
+    return cached[1]
+
+
+def _play_task(task):
+    from neuro import self_play_for_pair
+    pair_index, model_paths, num_games, parallel_games, options = task
+    model1 = load_model_cached(model_paths[0])
+    model2 = load_model_cached(model_paths[1])
+    with metrics.profiled(f'selfplay_pair{pair_index}'):
+        result = self_play_for_pair(pair_index, model1, model2, num_games=num_games, parallel_games=parallel_games,
+                                    **options)
+    # Метрики процесса уходят в главный процесс вместе с результатом
+    return result, metrics.collect()
+
+
+# Пул процессов spawn с ограничением потоков; используется и турниром моделей
+def spawn_pool(num_workers=None, threads_per_worker=1):
+    context = multiprocessing.get_context('spawn')
+    return context.Pool(num_workers or multiprocessing.cpu_count(), initializer=_init_worker,
+                        initargs=(threads_per_worker,))
+
+
+class SelfPlayPool:
+    # self_play_options передаются в neuro.self_play_for_pair (например, mcts_simulations)
+    def __init__(self, num_workers=None, threads_per_worker=1, parallel_games=32, **self_play_options):
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.parallel_games = parallel_games
+        self.self_play_options = self_play_options
+        self.pool = spawn_pool(self.num_workers, threads_per_worker)
+
+    # Партии делятся на задачи по games_per_task (по умолчанию — примерно
+    # waves задач на процесс), результаты отдаются по мере готовности. В работе
+    # одновременно не больше num_workers задач, и следующая отправляется только
+    # после того, как вызывающий код обработал очередной результат: если он
+    # успел сохранить новые веса в model_paths, следующая задача играет уже ими.
+    def play(self, pair_index, model_paths, num_games, games_per_task=None, waves=4):
+        if games_per_task is None:
+            games_per_task = max(1, -(-num_games // (self.num_workers * waves)))
+        tasks = []
+        while num_games > 0:
+            count = min(games_per_task, num_games)
+            tasks.append((pair_index, tuple(model_paths), count, self.parallel_games, self.self_play_options))
+            num_games -= count
+        tasks.reverse()
+        done = queue.Queue()
+
+        def submit():
+            if not tasks:
+                return 0
+            self.pool.apply_async(_play_task, (tasks.pop(),), callback=done.put, error_callback=done.put)
+            return 1
+
+        running = sum(submit() for _ in range(self.num_workers))
+        while running:
+            item = done.get()
+            running -= 1
+            if isinstance(item, BaseException):
+                raise item
+            result, worker_metrics = item
+            metrics.merge(worker_metrics)
+            yield result
+            running += submit()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.pool.terminate()
+        return False